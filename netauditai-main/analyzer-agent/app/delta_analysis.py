@@ -0,0 +1,247 @@
+import json
+import os
+import re
+
+BASELINE_DIR = os.getenv("BASELINE_DIR", "baselines")
+EPHEMERAL_PORT_START = 32768
+FLOW_CHANGE_RATIO = 0.5  # a flow counts as changed when its byte count moves by more than 50%
+
+# Report sections that only need regenerating when their source data changed
+SECTION_SOURCES = {
+    "Security Posture": "hosts",
+    "Suspicious Traffic": "blacklist",
+    "Performance Health": "flows",
+}
+ALWAYS_REGENERATED = ["Executive Summary", "Recommendations Table"]
+# Every heading of the report layout; any other heading the model writes belongs to the section above it
+REPORT_SECTIONS = ["Executive Summary", "Detailed Findings", *SECTION_SOURCES, "Recommendations Table"]
+
+
+def _load_json(value):
+    """Scan sections may arrive as already-encoded JSON strings."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return {}
+    return value or {}
+
+
+def _baseline_path(target: str):
+    safe_target = re.sub(r"[^A-Za-z0-9_.-]", "_", target)
+    return os.path.join(BASELINE_DIR, f"{safe_target}.json")
+
+
+def load_baseline(target: str):
+    path = _baseline_path(target)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[!] Failed to load baseline for {target}: {e}")
+        return None
+
+
+def save_baseline(target: str, snapshot: dict, report: str):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = _baseline_path(target)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"snapshot": snapshot, "report": report}, f)
+    os.replace(tmp_path, path)
+
+
+def extract_hosts(network_scan_result):
+    """Map host address -> {"ports": {port: "service version"}, "os": os guess}."""
+    hosts = {}
+    for host in _load_json(network_scan_result).get("hosts", []):
+        address = host.get("address")
+        if not address:
+            continue
+        hosts[address] = {
+            "ports": {
+                str(port.get("portid")): f"{port.get('service', '')} {port.get('version', '')}".strip()
+                for port in host.get("ports", [])
+            },
+            "os": host.get("os"),
+        }
+    return hosts
+
+
+def _flow_endpoint(endpoint: str):
+    # Drop ephemeral client ports so the same conversation matches across captures
+    ip, _, port = endpoint.rpartition(":")
+    if port.isdigit() and int(port) >= EPHEMERAL_PORT_START:
+        return ip
+    return endpoint
+
+
+def extract_flows(performance_assessment):
+    """Map "interface source <-> destination" -> total bytes, with ephemeral ports folded."""
+    flows = {}
+    assessments = _load_json(performance_assessment)
+    if not isinstance(assessments, list):
+        return flows
+
+    for entry in assessments:
+        interface = entry.get("interface", "")
+        for source, data in _load_json(entry.get("assessment")).items():
+            if not isinstance(data, dict):
+                continue
+            for conv in data.get("conversations", []):
+                endpoints = sorted([_flow_endpoint(source), _flow_endpoint(conv.get("destination", ""))])
+                key = f"{interface} {endpoints[0]} <-> {endpoints[1]}"
+                flows[key] = flows.get(key, 0) + conv.get("total_bytes", 0)
+    return flows
+
+
+def extract_blacklist(packet_tracer_result):
+    """Map IP -> status for every entry reported by the packet tracer."""
+    return {
+        ip: status for ip, status in _load_json(packet_tracer_result).items()
+        if isinstance(status, str)
+    }
+
+
+def build_snapshot(performance_assessment, network_scan_result, packet_tracer_result):
+    return {
+        "hosts": extract_hosts(network_scan_result),
+        "flows": extract_flows(performance_assessment),
+        "blacklist": extract_blacklist(packet_tracer_result),
+    }
+
+
+def _host_record(host):
+    # Baselines saved before the OS was kept apart stored it as an "os" entry among the ports
+    if host is None or "ports" in host:
+        return host
+    ports = dict(host)
+    return {"ports": ports, "os": ports.pop("os", None)}
+
+
+def _diff_hosts(old: dict, new: dict):
+    changes = {}
+    for address in old.keys() | new.keys():
+        before, after = _host_record(old.get(address)), new.get(address)
+        if before == after:
+            continue
+        if before is None:
+            changes[address] = {"status": "new host", **after}
+        elif after is None:
+            changes[address] = {"status": "host no longer seen", **before}
+        else:
+            before_ports, after_ports = before["ports"], after["ports"]
+            changes[address] = {
+                "status": "changed",
+                "opened": {port: after_ports[port] for port in after_ports.keys() - before_ports.keys()},
+                "closed": {port: before_ports[port] for port in before_ports.keys() - after_ports.keys()},
+                "modified": {
+                    port: {"before": before_ports[port], "after": after_ports[port]}
+                    for port in before_ports.keys() & after_ports.keys() if before_ports[port] != after_ports[port]
+                },
+            }
+            if before["os"] != after["os"]:
+                changes[address]["os"] = {"before": before["os"], "after": after["os"]}
+    return changes
+
+
+def _diff_flows(old: dict, new: dict):
+    changes = {}
+    for key in old.keys() | new.keys():
+        before, after = old.get(key), new.get(key)
+        if before is None:
+            changes[key] = {"status": "new flow", "total_bytes": after}
+        elif after is None:
+            changes[key] = {"status": "flow no longer seen", "total_bytes": before}
+        elif abs(after - before) > FLOW_CHANGE_RATIO * max(before, 1):
+            changes[key] = {"status": "changed", "before_bytes": before, "after_bytes": after}
+    return changes
+
+
+def _diff_blacklist(old: dict, new: dict):
+    changes = {}
+    for ip in old.keys() | new.keys():
+        before, after = old.get(ip), new.get(ip)
+        if before == after:
+            continue
+        # Only blacklist hits matter to the report, clean IPs coming and going do not
+        if (before or "").startswith("[!]") or (after or "").startswith("[!]"):
+            changes[ip] = {"before": before, "after": after}
+    return changes
+
+
+def compute_delta(baseline: dict, snapshot: dict):
+    return {
+        "hosts": _diff_hosts(baseline.get("hosts", {}), snapshot["hosts"]),
+        "flows": _diff_flows(baseline.get("flows", {}), snapshot["flows"]),
+        "blacklist": _diff_blacklist(baseline.get("blacklist", {}), snapshot["blacklist"]),
+    }
+
+
+def delta_summary(delta: dict):
+    return {kind: len(changes) for kind, changes in delta.items()}
+
+
+def _section_title(heading: str):
+    title = heading.lstrip("#").strip()
+    return re.sub(r"^\d+\.\s*", "", title)
+
+
+def split_sections(report: str, titles: list[str] = None):
+    """
+    Split a Markdown report into ordered (heading line, body) pairs; text before the first heading has no heading.
+    With `titles`, only those headings start a section and any other heading stays in the body it sits in.
+    """
+    sections = []
+    heading, body = None, []
+    for line in report.splitlines():
+        if line.startswith("#") and (titles is None or _section_title(line) in titles):
+            if heading is not None or body:
+                sections.append((heading, "\n".join(body)))
+            heading, body = line, []
+        else:
+            body.append(line)
+    if heading is not None or body:
+        sections.append((heading, "\n".join(body)))
+    return sections
+
+
+def sections_to_update(delta: dict):
+    return ALWAYS_REGENERATED + [
+        section for section, source in SECTION_SOURCES.items() if delta[source]
+    ]
+
+
+def prior_sections(report: str, titles: list[str]):
+    """Return the prior report restricted to the given section titles."""
+    return "\n".join(
+        f"{heading}\n{body}" for heading, body in split_sections(report, REPORT_SECTIONS)
+        if heading and _section_title(heading) in titles
+    )
+
+
+def merge_report(prior: str, update: str):
+    """
+    Replace every section of `prior` whose title appears in `update`, sub-headings included;
+    sections missing from `prior` are appended.
+    """
+    updated = {
+        _section_title(heading): (heading, body)
+        for heading, body in split_sections(update, REPORT_SECTIONS) if heading
+    }
+
+    merged = []
+    for heading, body in split_sections(prior, REPORT_SECTIONS):
+        title = _section_title(heading) if heading else None
+        if title in updated:
+            merged.append(updated.pop(title))
+        else:
+            merged.append((heading, body))
+    merged.extend(updated.values())
+
+    return "\n".join(
+        f"{heading}\n{body}" if heading else body
+        for heading, body in merged
+    )
@@ -1,16 +1,42 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 import openai
+import asyncio
 import os
+import json
+import time
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Any
 
+from delta_analysis import (
+    build_snapshot,
+    compute_delta,
+    delta_summary,
+    load_baseline,
+    merge_report,
+    prior_sections,
+    save_baseline,
+    sections_to_update,
+)
+from map_reduce import (
+    CHUNK_SUMMARY,
+    assemble_report,
+    chunk_findings,
+    chunk_scan,
+    group_by_host,
+    map_chunks,
+    use_map_reduce,
+)
+
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 assistant_id = os.getenv("OPENAI_ASSISTANT_ID")
 
+POLL_INTERVAL = 0.5  # seconds before the first status check of a run
+POLL_MAX_INTERVAL = 5.0  # the wait doubles up to this between checks
+
 app = FastAPI()
 
 app.add_middleware(
@@ -21,27 +47,218 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/health")
+async def health():
+    return {"status": "OK"}
+
 class AnalysisRequest(BaseModel):
     performance_assessment: Any = None
     network_scan_result: Any = None
     packet_tracer_result: Any = None
+    target: str | None = None
+    full: bool = False
+    map_reduce: bool | None = None  # None picks map-reduce automatically for large scans
+
+
+def _as_json(value: Any) -> str:
+    """Embed a scan section in a prompt as compact JSON; sections that are already encoded pass through."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _run_assistant(prompt: str) -> str:
+    thread = openai.beta.threads.create()
+
+    openai.beta.threads.messages.create(
+        thread_id=thread.id,
+        role="user",
+        content=prompt
+    )
+
+    run = openai.beta.threads.runs.create(
+        thread_id=thread.id,
+        assistant_id=assistant_id
+    )
+
+    # Runs take seconds to minutes, so back off instead of hammering the API (and its rate limit)
+    interval = POLL_INTERVAL
+    while True:
+        time.sleep(interval)
+        run_status = openai.beta.threads.runs.retrieve(
+            thread_id=thread.id,
+            run_id=run.id
+        )
+        if run_status.status in ["completed", "failed", "cancelled", "expired"]:
+            break
+        interval = min(interval * 2, POLL_MAX_INTERVAL)
+
+    if run_status.status != "completed":
+        raise Exception(f"Run status: {run_status.status}")
+
+    messages = openai.beta.threads.messages.list(thread_id=thread.id)
+    assistant_messages = [
+        m for m in messages.data if m.role == "assistant"
+    ]
+
+    if not assistant_messages:
+        raise Exception("No assistant message found")
+
+    return assistant_messages[0].content[0].text.value
+
+
+def build_delta_prompt(delta: dict, prior_report: str, sections: list[str]) -> str:
+    return f"""
+You are a senior network-security & performance analyst.
+
+You previously wrote the report sections below for this target. A new scan was taken and only the
+differences against the previous scan are provided as raw JSON (hosts: open ports per host,
+flows: bytes per conversation, blacklist: changes involving `[!]` entries).
+
+**Changes since the previous scan:**  
+{_as_json(delta)}
+
+**Previous report sections:**  
+{prior_report}
+
+Rewrite only these sections, in this order: {", ".join(sections)}.
+- Keep every heading exactly as it appears in the previous report, with the same Markdown level.
+- Keep findings that are unaffected by the changes, update or remove findings the changes invalidate, and add findings for new items.
+- Re-evaluate the **Risk score A–F** and **Performance score 1–5** in the Executive Summary in light of the changes.
+- Do not output any section that is not listed above.
+
+Do **not** use emojis or tables; maintain a professional, detailed tone.
+"""
+
+
+def build_map_prompt(chunk: dict) -> str:
+    return f"""
+You are a senior network-security & performance analyst.
+
+This is one part of a larger scan, covering only these hosts: {", ".join(chunk["hosts"])}.
+The scan results for them are provided as raw JSON (do not alter their formatting):
+
+**Performance Assessment:**  
+{_as_json(chunk["performance_assessment"])}
+
+**Network Scan Results:**  
+{_as_json(chunk["network_scan_result"])}
+
+**Packet Tracer Results:**  
+{_as_json(chunk["packet_tracer_result"])}
+
+Write only the following Markdown sections, with exactly these headings:
+
+### 1. Security Posture  
+- List each host → open-port/service. Flag risky services and map each to at least one CVE, NIST guideline, or industry best practice.  
+- Rate each host’s exposure on a 4-level scale (Critical · High · Moderate · Low) with justification.  
+
+### 2. Suspicious Traffic  
+- Every packet tracer entry beginning `[!]` is suspect. Explain *why* and propose containment or monitoring steps.  
+
+### 3. Performance Health  
+- For every flow: average throughput in Mbps, packets per second and goodput (%). Point out slow or unusually long flows and their probable root cause.  
+
+### {CHUNK_SUMMARY}  
+- At most 120 words: the most severe exposure, any suspicious traffic, the fastest and slowest flows with their throughput, and the fixes you would prioritise for these hosts.  
+
+Do not write an Executive Summary or Recommendations. Do **not** use emojis or tables; maintain a professional, detailed tone.
+"""
+
+
+def build_reduce_prompt(summaries: list[str], global_context: dict, host_count: int) -> str:
+    parts = "\n\n".join(f"**Part {number}:**  \n{summary}" for number, summary in enumerate(summaries, start=1))
+    return f"""
+You are a senior network-security & performance analyst.
+
+A scan of {host_count} hosts was analyzed in {len(summaries)} parts. The summaries of every part follow:
+
+{parts}
+
+Traffic that is not attributed to a single host (folded low-volume talkers, top-talker summaries) is provided as raw JSON:  
+{_as_json(global_context)}
+
+Write only these two sections of the final report, in Markdown, with exactly these headings:
+
+# Executive Summary  
+- ≤ 200 words, plain language for a non-technical manager  
+- Two overall scores for the whole network: **Risk score A–F** (A=Excellent, F=Critical) and **Performance score 1–5** (1=Poor, 5=Excellent)  
+- Emphasize “why it matters,” not just raw metrics  
+
+## Recommendations Table  
+- At least one **quick win** (firewall rule / patch / config) **and** one **strategic** item (e.g., network segmentation, long-term monitoring).  
+- For each recommendation, specify: expected benefit, risk mitigated, and estimated implementation time.  
+
+Do **not** use emojis or tables; maintain a professional, detailed tone.
+"""
+
+
+async def run_map_reduce(req: AnalysisRequest) -> str:
+    per_host, global_context = group_by_host(
+        req.performance_assessment, req.network_scan_result, req.packet_tracer_result
+    )
+    chunks = chunk_scan(per_host)
+    print(f"[+] Map-reduce analysis of {len(per_host)} hosts in {len(chunks)} chunks")
+
+    map_reports = await map_chunks(chunks, lambda chunk: _run_assistant(build_map_prompt(chunk)))
+    findings, summaries = chunk_findings(map_reports)
+
+    reduce_report = await asyncio.to_thread(
+        _run_assistant, build_reduce_prompt(summaries, global_context, len(per_host))
+    )
+    return assemble_report(findings, reduce_report)
+
 
 @app.post("/analyze")
 async def analyze(req: AnalysisRequest):
     try:
+        snapshot = build_snapshot(req.performance_assessment, req.network_scan_result, req.packet_tracer_result)
+        baseline = load_baseline(req.target) if req.target and not req.full else None
+
+        map_reduce = req.map_reduce
+        if map_reduce is None:
+            map_reduce = use_map_reduce(req.performance_assessment, req.network_scan_result, req.packet_tracer_result)
+
+        if baseline:
+            delta = compute_delta(baseline["snapshot"], snapshot)
+            summary = delta_summary(delta)
+
+            if not any(summary.values()):
+                print(f"[+] No changes for {req.target}, reusing previous report")
+                return {"analysis": baseline["report"], "mode": "unchanged", "delta": summary}
+
+        # A large scan's delta can be as big as the scan itself, so it goes through map-reduce instead
+        if baseline and not map_reduce:
+            sections = sections_to_update(delta)
+            print(f"[+] Incremental analysis for {req.target}: {summary}")
+            update = await asyncio.to_thread(_run_assistant, build_delta_prompt(
+                delta, prior_sections(baseline["report"], sections), sections
+            ))
+            report = merge_report(baseline["report"], update)
+            save_baseline(req.target, snapshot, report)
+
+            return {"analysis": report, "mode": "incremental", "delta": summary}
+
+        if map_reduce:
+            report = await run_map_reduce(req)
+            if req.target:
+                save_baseline(req.target, snapshot, report)
+
+            return {"analysis": report, "mode": "map_reduce"}
+
         analysis_prompt = f"""
 You are a senior network-security & performance analyst.
 
 The following scan results are provided as raw JSON (do not alter their formatting):
 
 **Performance Assessment:**  
-{req.performance_assessment}
+{_as_json(req.performance_assessment)}
 
 **Network Scan Results:**  
-{req.network_scan_result}
+{_as_json(req.network_scan_result)}
 
 **Packet Tracer Results:**  
-{req.packet_tracer_result}
+{_as_json(req.packet_tracer_result)}
 
 Produce one comprehensive security & performance report in Markdown, structured exactly as follows:
 
@@ -78,39 +295,12 @@ Produce one comprehensive security & performance report in Markdown, structured
 Whenever you reference a value, clearly state which JSON file and line number it came from. Do **not** use emojis or tables; maintain a professional, detailed tone.
 """
 
-        thread = openai.beta.threads.create()
-
-        openai.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=analysis_prompt
-        )
-
-        run = openai.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=assistant_id
-        )
-
-        while True:
-            run_status = openai.beta.threads.runs.retrieve(
-                thread_id=thread.id,
-                run_id=run.id
-            )
-            if run_status.status in ["completed", "failed", "cancelled"]:
-                break
-
-        if run_status.status != "completed":
-            return {"error": f"Run status: {run_status.status}"}
-
-        messages = openai.beta.threads.messages.list(thread_id=thread.id)
-        assistant_messages = [
-            m for m in messages.data if m.role == "assistant"
-        ]
-
-        if not assistant_messages:
-            return {"error": "No assistant message found"}
+        # The blocking OpenAI client runs off the event loop, so other requests are served meanwhile
+        report = await asyncio.to_thread(_run_assistant, analysis_prompt)
+        if req.target:
+            save_baseline(req.target, snapshot, report)
 
-        return {"analysis": assistant_messages[0].content[0].text.value}
+        return {"analysis": report, "mode": "full"}
 
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
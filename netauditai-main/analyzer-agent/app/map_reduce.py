@@ -0,0 +1,198 @@
+import asyncio
+import ipaddress
+import json
+import os
+import re
+
+from delta_analysis import _load_json, _section_title, split_sections
+
+CHUNK_HOSTS = int(os.getenv("MAP_REDUCE_CHUNK_HOSTS", "8"))
+MAP_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+# Above either limit one prompt gets slow or risks the context window, so /analyze switches to map-reduce
+MAP_REDUCE_MIN_HOSTS = int(os.getenv("MAP_REDUCE_MIN_HOSTS", "16"))
+MAP_REDUCE_MIN_CHARS = int(os.getenv("MAP_REDUCE_MIN_CHARS", "60000"))
+
+SEGMENT_PREFIX = {4: 24, 6: 64}
+
+FINDING_SECTIONS = ["Security Posture", "Suspicious Traffic", "Performance Health"]
+CHUNK_SUMMARY = "Chunk Summary"
+
+
+def _address(key: str):
+    """
+    The IP an entry is about: "ip", "ip:port", "ip port-scan", "src -> dst:port beacon",
+    or nmap's "name (ip)" for reverse-resolved hosts.
+    """
+    resolved = re.search(r"\(([0-9A-Fa-f.:]+)\)", key or "")
+    candidate = resolved.group(1) if resolved else (key.split()[0] if key else "")
+    if candidate.count(":") == 1:
+        candidate = candidate.rpartition(":")[0]
+    try:
+        return ipaddress.ip_address(candidate)
+    except ValueError:
+        return None
+
+
+def group_by_host(performance_assessment, network_scan_result, packet_tracer_result):
+    """
+    Map address -> that host's slice of the three scan sections.
+    Entries that belong to no single host (the folded "other" talkers, heavy-hitter summaries,
+    nmap hosts without a readable address) are returned separately as global context for the reduce step.
+    """
+    per_host = {}
+
+    def bucket(address):
+        return per_host.setdefault(address, {"performance": {}, "hosts": [], "tracer": {}})
+
+    # Nothing is dropped: entries that cannot be tied to one address go to the global context
+    global_context = {"hosts": [], "performance_assessment": [], "packet_tracer_result": {}}
+
+    for host in _load_json(network_scan_result).get("hosts", []):
+        address = _address(host.get("address") or "")
+        if address is None:
+            global_context["hosts"].append(host)
+        else:
+            bucket(address)["hosts"].append(host)
+
+    assessments = _load_json(performance_assessment)
+    for entry in assessments if isinstance(assessments, list) else []:
+        interface = entry.get("interface", "")
+        unassigned = {}
+        for source, data in _load_json(entry.get("assessment")).items():
+            address = _address(source)
+            if address is None:
+                unassigned[source] = data
+            else:
+                bucket(address)["performance"].setdefault(interface, {})[source] = data
+        global_context["performance_assessment"].append({
+            "interface": interface,
+            "assessment": unassigned,
+            "heavy_hitters": entry.get("heavy_hitters"),
+        })
+
+    for key, status in _load_json(packet_tracer_result).items():
+        address = _address(key)
+        if address is None:
+            global_context["packet_tracer_result"][key] = status
+        else:
+            bucket(address)["tracer"][key] = status
+
+    return per_host, global_context
+
+
+def chunk_scan(per_host: dict, chunk_hosts: int = CHUNK_HOSTS):
+    """
+    Split per-host slices into chunks of at most `chunk_hosts` hosts. Hosts of one segment
+    (/24, or /64 for IPv6) stay together unless the segment alone is larger than a chunk, and
+    small segments are packed into the same chunk. Each chunk has the shape of a regular scan result.
+    """
+    segments = {}
+    for address in per_host:
+        prefix = SEGMENT_PREFIX[address.version]
+        segments.setdefault(ipaddress.ip_network(f"{address}/{prefix}", strict=False), []).append(address)
+
+    groups, current = [], []
+    for segment in sorted(segments, key=lambda network: (network.version, network)):
+        members = sorted(segments[segment])
+        if current and len(current) + len(members) > chunk_hosts:
+            groups.append(current)
+            current = []
+        for start in range(0, len(members), chunk_hosts):
+            current.extend(members[start:start + chunk_hosts])
+            if len(current) >= chunk_hosts:
+                groups.append(current)
+                current = []
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for members in groups:
+        performance, hosts, tracer = {}, [], {}
+        for address in members:
+            data = per_host[address]
+            for interface, sources in data["performance"].items():
+                performance.setdefault(interface, {}).update(sources)
+            hosts.extend(data["hosts"])
+            tracer.update(data["tracer"])
+        chunks.append({
+            "hosts": [str(address) for address in members],
+            "performance_assessment": [
+                {"interface": interface, "assessment": sources} for interface, sources in performance.items()
+            ],
+            "network_scan_result": {"hosts": hosts},
+            "packet_tracer_result": tracer,
+        })
+    return chunks
+
+
+def use_map_reduce(performance_assessment, network_scan_result, packet_tracer_result):
+    per_host, _ = group_by_host(performance_assessment, network_scan_result, packet_tracer_result)
+    size = sum(
+        len(json.dumps(_load_json(section), separators=(",", ":")))
+        for section in (performance_assessment, network_scan_result, packet_tracer_result)
+    )
+    return len(per_host) >= MAP_REDUCE_MIN_HOSTS or size >= MAP_REDUCE_MIN_CHARS
+
+
+async def map_chunks(chunks: list, analyze_chunk, concurrency: int = MAP_CONCURRENCY):
+    """
+    Run the blocking `analyze_chunk(chunk)` for every chunk in worker threads, at most
+    `concurrency` at a time. Results keep the chunk order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index, chunk):
+        async with semaphore:
+            print(f"[+] Map {index + 1}/{len(chunks)}: {chunk['hosts'][0]} - {chunk['hosts'][-1]}")
+            return await asyncio.to_thread(analyze_chunk, chunk)
+
+    return await asyncio.gather(*(run(index, chunk) for index, chunk in enumerate(chunks)))
+
+
+def chunk_findings(map_reports: list):
+    """Collect every chunk's body per finding section, plus the chunk summaries for the reduce step."""
+    findings = {section: [] for section in FINDING_SECTIONS}
+    summaries = []
+    for report in map_reports:
+        collected = {section: [] for section in FINDING_SECTIONS + [CHUNK_SUMMARY]}
+        current = None
+        for heading, body in split_sections(report):
+            title = _section_title(heading) if heading else None
+            if title in collected:
+                current = title
+                collected[current].append(body.strip())
+            elif current is not None and heading:
+                # Sub-headings the model added (e.g. one per host) stay inside their section
+                collected[current].append(f"{heading}\n{body.strip()}")
+        for section in FINDING_SECTIONS:
+            text = "\n".join(part for part in collected[section] if part)
+            if text:
+                findings[section].append(text)
+        summary = "\n".join(part for part in collected[CHUNK_SUMMARY] if part)
+        if summary:
+            summaries.append(summary)
+    return findings, summaries
+
+
+def assemble_report(findings: dict, reduce_report: str):
+    """
+    Build the report in the single-prompt layout: the reduce step's Executive Summary, the
+    concatenated per-chunk Detailed Findings, then the reduce step's Recommendations Table.
+    """
+    reduced = {"Executive Summary": [], "Recommendations Table": []}
+    current = None
+    for heading, body in split_sections(reduce_report):
+        title = _section_title(heading) if heading else None
+        if title in reduced:
+            current = title
+        if current is not None and heading:
+            reduced[current].append(f"{heading}\n{body.strip()}".strip())
+    executive = "\n\n".join(reduced["Executive Summary"]) or "# Executive Summary"
+    recommendations = "\n\n".join(reduced["Recommendations Table"]) or "## Recommendations Table"
+
+    parts = [executive, "## Detailed Findings"]
+    for number, section in enumerate(FINDING_SECTIONS, start=1):
+        parts.append(f"### {number}. {section}")
+        parts.append("\n\n".join(findings[section]) or "No findings.")
+    parts.append(recommendations)
+    return "\n\n".join(parts)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+NetAudit on-device collector.
+
+Uploaded and run on the audited host by the connector. Captures TCP packets with tshark, aggregates
+them into conversations and discovered IPs locally, and prints one compact summary line so only the
+aggregate crosses the SSH link. Pure standard library, Python 3.6+.
+
+Reads tshark field lines from --input instead of capturing when given (use "-" for stdin).
+"""
+import argparse
+import base64
+import json
+import subprocess
+import sys
+import zlib
+
+RESULT_MARKER = "NETAUDIT_COLLECTOR_RESULT "
+SUMMARY_FORMAT = 1
+MAX_FLOWS = 50000
+
+FIELDS = [
+    "frame.interface_name", "frame.time_relative", "ip.src", "tcp.srcport",
+    "ip.dst", "tcp.dstport", "frame.len",
+]
+
+
+def tshark_command(interfaces, duration, capture_filter="tcp"):
+    command = ["tshark", "-l", "-n", "-f", capture_filter, "-a", "duration:%d" % duration,
+               "-T", "fields", "-E", "separator=,"]
+    for interface in interfaces:
+        command += ["-i", interface]
+    for field in FIELDS:
+        command += ["-e", field]
+    return command
+
+
+class Aggregator:
+    def __init__(self, max_flows=MAX_FLOWS):
+        self.max_flows = max_flows
+        self.flows = {}
+        self.ips = set()
+        self.packets = 0
+        self.untracked_packets = 0
+        self.untracked_bytes = 0
+
+    def add_line(self, line):
+        parts = line.strip().split(",")
+        if len(parts) != len(FIELDS):
+            return
+        interface, relative, src_ip, src_port, dst_ip, dst_port, length = parts
+        if not src_ip or not dst_ip:
+            return
+        try:
+            relative = float(relative)
+            length = int(length)
+        except ValueError:
+            return
+
+        self.packets += 1
+        self.ips.add(src_ip)
+        self.ips.add(dst_ip)
+
+        source = "%s:%s" % (src_ip, src_port)
+        destination = "%s:%s" % (dst_ip, dst_port)
+        key = (interface,) + ((source, destination) if source <= destination else (destination, source))
+        flow = self.flows.get(key)
+        if flow is None:
+            if len(self.flows) >= self.max_flows:
+                self.untracked_packets += 1
+                self.untracked_bytes += length
+                return
+            # The first packet seen decides which side is reported as the source, like tshark's conv table
+            flow = self.flows[key] = [interface, source, destination, 0, 0, 0, 0, relative, relative]
+
+        if source == flow[1]:
+            flow[3] += 1
+            flow[4] += length
+        else:
+            flow[5] += 1
+            flow[6] += length
+        flow[8] = relative
+
+    def summary(self, version):
+        return {
+            "format": SUMMARY_FORMAT,
+            "version": version,
+            "packets": self.packets,
+            "untracked_packets": self.untracked_packets,
+            "untracked_bytes": self.untracked_bytes,
+            # [interface, source, destination, s2d frames, s2d bytes, d2s frames, d2s bytes, start, duration]
+            "flows": [
+                flow[:7] + [round(flow[7], 6), round(flow[8] - flow[7], 6)]
+                for flow in self.flows.values()
+            ],
+            "ips": sorted(self.ips),
+        }
+
+
+def encode_summary(summary, compress=True):
+    body = json.dumps(summary, separators=(",", ":")).encode()
+    if compress:
+        return "z" + base64.b64encode(zlib.compress(body, 9)).decode()
+    return "j" + body.decode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NetAudit on-device flow collector")
+    parser.add_argument("-i", "--interface", action="append", default=[])
+    parser.add_argument("-d", "--duration", type=int, default=10)
+    parser.add_argument("--input", help="read tshark field lines from a file or '-' instead of capturing")
+    parser.add_argument("-f", "--filter", default="tcp", help="BPF capture filter")
+    parser.add_argument("--version", default="", help="version hash echoed back to the connector")
+    parser.add_argument("--max-flows", type=int, default=MAX_FLOWS)
+    parser.add_argument("--no-compress", action="store_true")
+    args = parser.parse_args(argv)
+
+    aggregator = Aggregator(args.max_flows)
+
+    if args.input:
+        stream = sys.stdin if args.input == "-" else open(args.input)
+        for line in stream:
+            aggregator.add_line(line)
+    else:
+        if not args.interface:
+            parser.error("at least one --interface is required when capturing")
+        process = subprocess.Popen(tshark_command(args.interface, args.duration, args.filter),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   universal_newlines=True)
+        for line in process.stdout:
+            aggregator.add_line(line)
+        process.wait()
+
+    sys.stdout.write(RESULT_MARKER + encode_summary(aggregator.summary(args.version), not args.no_compress) + "\n")
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import zlib
+
+from .collector import RESULT_MARKER, SUMMARY_FORMAT
+
+COLLECTOR_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "collector.py")
+REMOTE_DIR = ".netaudit"  # relative to the SSH user's home, never a shared directory like /tmp
+COLLECTOR_DEADLINE_MARGIN = 30
+
+
+@functools.lru_cache(maxsize=1)
+def collector_version():
+    """Content hash of the collector script; a new hash means the remote copy must be replaced."""
+    with open(COLLECTOR_SOURCE, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def remote_collector_path(version=None):
+    return f"{REMOTE_DIR}/collector-{version or collector_version()}.py"
+
+
+def ensure_collector(connector):
+    """Upload the collector over SFTP unless the remote host already has this exact version."""
+    version = collector_version()
+    remote_path = remote_collector_path(version)
+
+    sftp = connector.client.open_sftp()
+    try:
+        try:
+            sftp.stat(remote_path)
+            return remote_path
+        except FileNotFoundError:
+            pass
+
+        try:
+            sftp.mkdir(REMOTE_DIR, mode=0o700)
+        except OSError:
+            pass  # already exists
+
+        sftp.put(COLLECTOR_SOURCE, remote_path)
+        sftp.chmod(remote_path, 0o700)
+        print(f"[+] Uploaded collector {version} to {connector.ip}")
+    finally:
+        sftp.close()
+
+    return remote_path
+
+
+def decode_summary(output):
+    """Extract and decode the collector's result line from (possibly noisy) command output."""
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if not line.startswith(RESULT_MARKER):
+            continue
+
+        payload = line[len(RESULT_MARKER):]
+        if payload.startswith("z"):
+            summary = json.loads(zlib.decompress(base64.b64decode(payload[1:])))
+        else:
+            summary = json.loads(payload[1:])
+
+        if summary.get("format") != SUMMARY_FORMAT:
+            raise Exception(f"Unsupported collector summary format: {summary.get('format')}")
+        return summary
+
+    raise Exception("No collector result found in output")
+
+
+def collector_command(remote_path, interfaces, duration, capture_filter="tcp"):
+    interface_args = " ".join(f"-i {interface}" for interface in interfaces)
+    return f"python3 {remote_path} {interface_args} -d {duration} -f '{capture_filter}' --version {collector_version()}"
+
+
+def run_collector(connector, interfaces, duration=10, deadline=None, capture_filter="tcp"):
+    """Deploy if needed, run one capture across all interfaces on the device and return its summary."""
+    remote_path = ensure_collector(connector)
+    output = connector.execute_on_channel(
+        collector_command(remote_path, interfaces, duration, capture_filter),
+        use_sudo=True,
+        deadline=deadline if deadline is not None else duration + COLLECTOR_DEADLINE_MARGIN
+    )
+    return decode_summary(output)
+
+
+def summary_conversations(summary):
+    """Group collector flows per interface in the same shape parse_performance_data produces."""
+    conversations = {}
+    for interface, source, destination, s2d_frames, s2d_bytes, d2s_frames, d2s_bytes, start, duration in summary["flows"]:
+        conversations.setdefault(interface, []).append({
+            "source": source,
+            "destination": destination,
+            "source_to_dest_frames": s2d_frames,
+            "source_to_dest_bytes": s2d_bytes,
+            "dest_to_source_frames": d2s_frames,
+            "dest_to_source_bytes": d2s_bytes,
+            "total_frames": s2d_frames + d2s_frames,
+            "total_bytes": s2d_bytes + d2s_bytes,
+            "relative_start": start,
+            "duration": duration
+        })
+    return conversations
@@ -0,0 +1,265 @@
+import os
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+SCAN_STORE_DIR_ENV = "SCAN_STORE_DIR"
+TABLES = ("flows", "ports", "blacklist_hits")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise Exception("The pyarrow package is required for the columnar scan store")
+
+
+def _schemas():
+    common = [
+        ("scan_id", pa.string()),
+        ("scanned_at", pa.timestamp("s", tz="UTC")),
+    ]
+    return {
+        "flows": pa.schema(common + [
+            ("interface", pa.string()),
+            ("source", pa.string()),
+            ("source_ip", pa.string()),
+            ("destination", pa.string()),
+            ("destination_ip", pa.string()),
+            ("total_frames", pa.int64()),
+            ("total_bytes", pa.int64()),
+            ("duration", pa.float64()),
+            ("throughput_bps", pa.float64()),
+        ]),
+        "ports": pa.schema(common + [
+            ("address", pa.string()),
+            ("port", pa.int32()),
+            ("state", pa.string()),
+            ("service", pa.string()),
+            ("version", pa.string()),
+            ("os", pa.string()),
+        ]),
+        "blacklist_hits": pa.schema(common + [
+            ("key", pa.string()),
+            ("ip", pa.string()),
+            ("kind", pa.string()),
+            ("status", pa.string()),
+        ]),
+    }
+
+
+def _partitioning():
+    # Partition values are kept as strings so "2026-01-05" is never inferred as a date or an int
+    return ds.partitioning(pa.schema([("date", pa.string()), ("device", pa.string())]), flavor="hive")
+
+
+def _ip(endpoint: str):
+    return endpoint.rpartition(":")[0] or endpoint
+
+
+def _finding_kind(key: str):
+    # Packet tracer keys are "ip", "ip port-scan", "ip host-sweep" or "src -> dst:port beacon"
+    parts = key.split()
+    return parts[-1] if len(parts) > 1 else "blacklist"
+
+
+def _flow_row(interface, source, conv):
+    duration = conv.get("duration") or 0.0
+    return {
+        "interface": interface,
+        "source": source,
+        "source_ip": _ip(source),
+        "destination": conv.get("destination"),
+        "destination_ip": _ip(conv.get("destination", "")),
+        "total_frames": conv.get("total_frames"),
+        "total_bytes": conv.get("total_bytes"),
+        "duration": duration,
+        "throughput_bps": conv.get("total_bytes", 0) * 8 / duration if duration > 0 else None,
+    }
+
+
+def scan_rows(results: dict, conversations: dict = None):
+    """
+    Flatten one scan's results (ScanResults.model_dump()) into row dicts per table.
+    `conversations` (interface -> parse_performance_data output) are the flows before the
+    assessment keeps only the top talkers; without them flows come from the trimmed assessment.
+    """
+    rows = {table: [] for table in TABLES}
+
+    for interface, interface_conversations in (conversations or {}).items():
+        for conv in interface_conversations:
+            rows["flows"].append(_flow_row(interface, conv["source"], conv))
+
+    performance = results.get("performance_assessment") if conversations is None else None
+    for entry in performance if isinstance(performance, list) else []:
+        for source, data in (entry.get("assessment") or {}).items():
+            for conv in data.get("conversations", []):
+                rows["flows"].append(_flow_row(entry.get("interface"), source, conv))
+
+    for host in (results.get("network_scan_result") or {}).get("hosts", []) or []:
+        for port in host.get("ports", []):
+            rows["ports"].append({
+                "address": host.get("address"),
+                "port": int(port["portid"]) if str(port.get("portid", "")).isdigit() else None,
+                "state": port.get("state"),
+                "service": port.get("service"),
+                "version": port.get("version"),
+                "os": host.get("os"),
+            })
+
+    tracer = results.get("packet_tracer_result")
+    for key, status in (tracer.items() if isinstance(tracer, dict) else []):
+        # Only hits are stored; clean IPs would dominate the table without answering any question
+        if isinstance(status, str) and status.startswith("[!]"):
+            rows["blacklist_hits"].append({
+                "key": key,
+                "ip": key.split()[0],
+                "kind": _finding_kind(key),
+                "status": status,
+            })
+
+    return rows
+
+
+def _partition_dir(base_dir, table, scanned_at, device):
+    return os.path.join(base_dir, table, f"date={scanned_at.strftime('%Y-%m-%d')}", f"device={device}")
+
+
+def store_enabled():
+    return pa is not None and bool(os.getenv(SCAN_STORE_DIR_ENV))
+
+
+def export_scan(device: str, results: dict, base_dir: str = None, scanned_at: datetime = None,
+                conversations: dict = None):
+    """
+    Append one scan to the store as one Parquet file per table, under
+    <base_dir>/<table>/date=YYYY-MM-DD/device=<ip>/. Returns the scan id.
+    Pass the untrimmed `conversations` so every flow is stored, not just the top talkers'.
+    """
+    _require_pyarrow()
+    base_dir = base_dir or os.getenv(SCAN_STORE_DIR_ENV)
+    scanned_at = (scanned_at or datetime.now(timezone.utc)).replace(microsecond=0)
+    scan_id = uuid.uuid4().hex
+    schemas = _schemas()
+
+    for table, rows in scan_rows(results, conversations).items():
+        if not rows:
+            continue
+        for row in rows:
+            row["scan_id"] = scan_id
+            row["scanned_at"] = scanned_at
+        directory = _partition_dir(base_dir, table, scanned_at, device)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{scan_id}.parquet")
+        tmp_path = os.path.join(directory, f".part-{scan_id}.tmp")
+        pq.write_table(pa.Table.from_pylist(rows, schema=schemas[table]), tmp_path, compression="zstd")
+        # Readers skip dot files, so a half-written file is never picked up
+        os.replace(tmp_path, path)
+
+    return scan_id
+
+
+def _dataset(table: str, base_dir: str = None):
+    _require_pyarrow()
+    if table not in TABLES:
+        raise Exception(f"Unknown table: {table}")
+    path = os.path.join(base_dir or os.getenv(SCAN_STORE_DIR_ENV), table)
+    if not os.path.isdir(path):
+        return None
+    return ds.dataset(
+        path,
+        format="parquet",
+        partitioning=_partitioning(),
+        exclude_invalid_files=False,
+        ignore_prefixes=[".", "_"],
+    )
+
+
+def query(table: str, columns: list[str] = None, devices: list[str] = None, since: str = None,
+          until: str = None, where=None, base_dir: str = None, limit: int = None):
+    """
+    Read rows of one table. `columns` prunes the columns read from disk; `devices`, `since` and
+    `until` (YYYY-MM-DD, inclusive) prune whole partition directories, and `where` (a
+    pyarrow.dataset expression, e.g. ds.field("port") == 445) is checked against Parquet
+    row-group statistics before any data is decoded.
+    """
+    dataset = _dataset(table, base_dir)
+    if dataset is None:
+        schema = _schemas()[table].append(pa.field("date", pa.string())).append(pa.field("device", pa.string()))
+        return schema.empty_table().select(columns or schema.names)
+
+    expression = None
+
+    def add(condition):
+        nonlocal expression
+        expression = condition if expression is None else expression & condition
+
+    if devices:
+        add(ds.field("device").isin(devices))
+    if since:
+        add(ds.field("date") >= since)
+    if until:
+        add(ds.field("date") <= until)
+    if where is not None:
+        add(where)
+
+    if limit is not None:
+        return dataset.head(limit, columns=columns, filter=expression)
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def host_throughput(address: str, since: str = None, until: str = None, base_dir: str = None):
+    """Per-day bytes and mean throughput of every flow to or from `address`, across all devices."""
+    flows = query(
+        "flows",
+        columns=["date", "total_bytes", "throughput_bps"],
+        since=since,
+        until=until,
+        # tshark lists a conversation once, with whichever endpoint it saw first as the source
+        where=(ds.field("source_ip") == address) | (ds.field("destination_ip") == address),
+        base_dir=base_dir,
+    )
+    return flows.group_by("date").aggregate([
+        ("total_bytes", "sum"),
+        ("throughput_bps", "mean"),
+    ]).sort_by("date")
+
+
+def ports_seen(since: str = None, until: str = None, devices: list[str] = None, base_dir: str = None):
+    """Every open port/service seen in the period, with the number of hosts and first/last sighting."""
+    ports = query(
+        "ports",
+        columns=["port", "service", "address", "scanned_at"],
+        devices=devices,
+        since=since,
+        until=until,
+        where=ds.field("state") == "open",
+        base_dir=base_dir,
+    )
+    return ports.group_by(["port", "service"]).aggregate([
+        ("address", "count_distinct"),
+        ("scanned_at", "min"),
+        ("scanned_at", "max"),
+    ]).sort_by([("address_count_distinct", "descending")])
+
+
+def compact_partition(table: str, date: str, device: str, base_dir: str = None):
+    """Merge a partition's per-scan files into one, so months of history stay a handful of files per day."""
+    _require_pyarrow()
+    directory = os.path.join(base_dir or os.getenv(SCAN_STORE_DIR_ENV), table, f"date={date}", f"device={device}")
+    parts = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+    if len(parts) < 2:
+        return 0
+
+    merged = pa.concat_tables([pq.read_table(os.path.join(directory, name)) for name in parts])
+    name = f"part-compacted-{uuid.uuid4().hex}"
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(merged.sort_by([("scanned_at", "ascending")]), tmp_path, compression="zstd")
+    os.replace(tmp_path, os.path.join(directory, f"{name}.parquet"))
+    for name in parts:
+        os.remove(os.path.join(directory, name))
+    return len(parts)
@@ -0,0 +1,186 @@
+import bisect
+import contextlib
+import fcntl
+import ipaddress
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+MAGIC = b"NABL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIdII")  # magic, format version, built_at, IPv4 range count, IPv6 range count
+STAT_INTERVAL = 1.0  # how often a worker checks whether another process swapped the index
+INDEX_PATH_ENV = "BLOCKLIST_INDEX_PATH"
+
+
+def default_index_path():
+    # /dev/shm is RAM backed, so every worker maps the same physical pages
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.getenv(INDEX_PATH_ENV, os.path.join(directory, "netaudit_blocklist.idx"))
+
+
+def _merged_ranges(networks):
+    ranges = sorted((int(net.network_address), int(net.broadcast_address)) for net in networks)
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def write_index(cidrs, path: str) -> int:
+    """
+    Build the index file from CIDR strings and move it over `path` in one rename, so readers
+    see either the old or the new index, never a mix. Returns the number of merged ranges.
+    """
+    v4, v6 = [], []
+    for cidr in cidrs:
+        try:
+            net = ipaddress.ip_network(cidr)
+        except ValueError:
+            continue  # Skip malformed lines
+        (v4 if net.version == 4 else v6).append(net)
+
+    v4_ranges = _merged_ranges(v4)
+    v6_ranges = _merged_ranges(v6)
+
+    body = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), len(v4_ranges), len(v6_ranges)),
+        array("I", [start for start, _ in v4_ranges]).tobytes(),
+        array("I", [end for _, end in v4_ranges]).tobytes(),
+        b"".join(start.to_bytes(16, "big") for start, _ in v6_ranges),
+        b"".join(end.to_bytes(16, "big") for _, end in v6_ranges),
+    ]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".blocklist-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for part in body:
+                f.write(part)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    return len(v4_ranges) + len(v6_ranges)
+
+
+class _MappedIndex:
+    """One generation of the index file, mapped read-only; IPv4 arrays are used in place without copying."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.built_at, self.v4_count, self.v6_count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise Exception(f"Unsupported blocklist index format in {path}")
+
+        view = memoryview(self.mm)
+        offset = HEADER.size
+        v4_size = 4 * self.v4_count
+        self.v4_starts = view[offset:offset + v4_size].cast("I")
+        self.v4_ends = view[offset + v4_size:offset + 2 * v4_size].cast("I")
+        offset += 2 * v4_size
+        self.v6 = view[offset:offset + 32 * self.v6_count]
+
+    def __len__(self):
+        return self.v4_count + self.v6_count
+
+    def _v6_entry(self, table: int, index: int) -> bytes:
+        offset = (table * self.v6_count + index) * 16
+        return bytes(self.v6[offset:offset + 16])
+
+    def contains(self, ip) -> bool:
+        if ip.version == 4:
+            value = int(ip)
+            index = bisect.bisect_right(self.v4_starts, value) - 1
+            return index >= 0 and value <= self.v4_ends[index]
+
+        key = ip.packed
+        low, high = 0, self.v6_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._v6_entry(0, middle) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        return low > 0 and key <= self._v6_entry(1, low - 1)
+
+
+class BlocklistIndex:
+    """
+    Blocklist shared by every worker process through one mmap'd file. Lookups are a binary search
+    over the mapped range arrays, so a worker holds no per-entry Python objects. A refresh by any
+    process replaces the file with a rename, and the other workers remap it on their next lookup.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or default_index_path()
+        self._mapped = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._current() is not None
+
+    @property
+    def built_at(self):
+        mapped = self._current()
+        return mapped.built_at if mapped is not None else None
+
+    def age(self):
+        built_at = self.built_at
+        return time.time() - built_at if built_at else None
+
+    def __len__(self):
+        mapped = self._current()
+        return len(mapped) if mapped is not None else 0
+
+    def _current(self):
+        if time.monotonic() - self._checked_at >= STAT_INTERVAL:
+            self.remap()
+        return self._mapped
+
+    def remap(self):
+        """Map the file again if another process swapped it since the last check."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if self._mapped is None or self._mapped.key != (stat.st_ino, stat.st_mtime_ns):
+                # The previous mapping is released once in-flight lookups drop their reference
+                self._mapped = _MappedIndex(self.path)
+
+    def contains(self, ip) -> bool:
+        mapped = self._current()
+        return mapped is not None and mapped.contains(ip)
+
+    @contextlib.contextmanager
+    def build_lock(self):
+        """Cross-process lock, so only one worker downloads and builds while the others wait for it."""
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def rebuild(self, cidrs) -> int:
+        count = write_index(cidrs, self.path)
+        self.remap()
+        return count
@@ -2,6 +2,8 @@ import re
 import subprocess
 import json
 from .ip_blacklist_checker import load_blacklist, is_ip_suspicious
+from .traffic_anomalies import detect_anomalies
+from TCP.tcp_scan import parse_performance_data
 
 def extract_source_ips(packet_capture):
     ip_pattern = r'(\d{1,3}.\d{1,3}.\d{1,3}.\d{1,3}):\d{1,4}\s'
@@ -16,27 +18,32 @@ def extract_source_ips(packet_capture):
 
     return source_ips
 
-def scan_packet_capture_from_string(interface_names, connector):
-    load_blacklist(force_update=True)
-
+def trace_capture_outputs(outputs, conversations=None):
+    """
+    Blacklist and anomaly findings for already captured `tshark -z conv,tcp` output, one per interface.
+    `conversations` (interface -> parsed rows) replaces the rows parsed from `outputs`, e.g. once filtered.
+    """
     results = {}
-    duration = 10
-
-    for interface in interface_names:
-        output = connector.execute_with_pty(
-            f"tshark -i {interface} -q -z conv,tcp, -a duration:{duration}",
-            use_sudo=True
-        )
+    rows = []
+    for interface, output in outputs.items():
         captured_ips = extract_source_ips(output)
 
         print(captured_ips)
 
-        for ip in captured_ips:
-            if is_ip_suspicious(ip):
-                results[ip] = "[!] IP is suspicious!"
-            else:
-                results[ip] = "[+] IP seems clean."
+        results.update(classify_ips(captured_ips))
+        rows.extend(conversations[interface] if conversations is not None else parse_performance_data(output))
+
+    results.update(detect_anomalies(rows))
+
+    return results
 
+def classify_ips(captured_ips):
+    results = {}
+    for ip in captured_ips:
+        if is_ip_suspicious(ip):
+            results[ip] = "[!] IP is suspicious!"
+        else:
+            results[ip] = "[+] IP seems clean."
     return results
 # Capturare IP-uri timp de X secunde
 def capture_ips(interface, duration=10):
@@ -1,12 +1,26 @@
 import os
 import requests
 import ipaddress
+import threading
+
+from .blocklist_index import BlocklistIndex
 
 FIREHOL_URL = "https://raw.githubusercontent.com/firehol/blocklist-ipsets/master/firehol_level1.netset"
 CACHE_FILE = "firehol_level1_cache.txt"
 CACHE_TTL = 86400  # 1 day
+REFRESH_MIN_AGE = 300  # a forced refresh reuses an index another worker built this recently
+
+_blocklist_index = None
+_index_lock = threading.Lock()
+
+
+def get_blocklist_index():
+    global _blocklist_index
+    with _index_lock:
+        if _blocklist_index is None:
+            _blocklist_index = BlocklistIndex()
+    return _blocklist_index
 
-_blacklist_cache = []
 
 def _download_firehol_list(url=FIREHOL_URL):
     try:
@@ -31,29 +45,39 @@ def _save_cache(cidr_list):
 
 def load_blacklist(use_cache=True, force_update=False):
     """
-    Load the blacklist into memory (once). Use `force_update=True` to re-download.
-    Converts CIDR strings to ip_network objects for fast comparison.
+    Make sure the shared blocklist index is built (once for all workers). Use `force_update=True`
+    to re-download, unless another worker refreshed it within REFRESH_MIN_AGE seconds.
     """
-    global _blacklist_cache
-    if _blacklist_cache and not force_update:
+    index = get_blocklist_index()
+
+    def fresh_enough():
+        if not index.ready:
+            return False
+        return not force_update or index.age() < REFRESH_MIN_AGE
+
+    if fresh_enough():
         return
 
-    if use_cache and os.path.exists(CACHE_FILE) and not force_update:
-        cidrs = _load_cache()
-    else:
-        cidrs = _download_firehol_list()
-        if use_cache:
-            _save_cache(cidrs)
+    with index.build_lock():
+        # Another worker may have built it while this one waited for the lock
+        index.remap()
+        if fresh_enough():
+            return
+
+        if use_cache and os.path.exists(CACHE_FILE) and not force_update:
+            cidrs = _load_cache()
+        else:
+            cidrs = _download_firehol_list()
+            if cidrs and use_cache:
+                _save_cache(cidrs)
+            elif not cidrs:
+                # Keep serving the last good list rather than an empty one
+                cidrs = _load_cache()
 
-    # Convert to ip_network objects for comparison
-    _blacklist_cache = []
-    for cidr in cidrs:
-        try:
-            net = ipaddress.ip_network(cidr)
-            _blacklist_cache.append(net)
-        except ValueError:
-            continue  # Skip malformed lines
-    print(len(_blacklist_cache))
+        if not cidrs and index.ready:
+            return
+        index.rebuild(cidrs)
+    print(len(index))
 
 
 def is_ip_suspicious(ip):
@@ -61,7 +85,8 @@ def is_ip_suspicious(ip):
     Check if the given IP is in any CIDR range in the loaded blacklist.
     Skips private/reserved IPs.
     """
-    if not _blacklist_cache:
+    index = get_blocklist_index()
+    if not index.ready:
         print("[!] Blacklist not loaded. Call load_blacklist() first.")
         return False
 
@@ -73,7 +98,7 @@ def is_ip_suspicious(ip):
         print(f"[!] Invalid IP address: {ip}")
         return False
 
-    return any(ip_obj in net for net in _blacklist_cache)
+    return index.contains(ip_obj)
 
 if __name__ == "__main__":
     _download_firehol_list()
\ No newline at end of file
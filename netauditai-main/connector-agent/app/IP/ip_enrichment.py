@@ -0,0 +1,306 @@
+import bisect
+import csv
+import glob
+import ipaddress
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+ENRICHMENT_DATA_DIR = os.getenv("ENRICHMENT_DATA_DIR", "enrichment_data")
+CACHE_SIZE = int(os.getenv("ENRICHMENT_CACHE_SIZE", "65536"))
+FIELDS = ("asn", "as_org", "country", "prefix")
+
+# Header aliases of the common offline datasets: iptoasn.com ip2asn-*.tsv, MaxMind GeoLite2 CSV, generic range tables
+_COLUMN_ALIASES = {
+    "start": ("start", "range_start", "ip_start", "start_ip", "first_ip"),
+    "end": ("end", "range_end", "ip_end", "end_ip", "last_ip"),
+    "network": ("network", "cidr", "prefix"),
+    "asn": ("asn", "as_number", "autonomous_system_number"),
+    "as_org": ("as_org", "as_description", "as_name", "organization", "autonomous_system_organization"),
+    "country": ("country", "country_code", "country_iso_code"),
+    "geoname": ("geoname_id", "registered_country_geoname_id"),
+}
+# iptoasn.com ships its TSV without a header
+_IP2ASN_COLUMNS = ["range_start", "range_end", "as_number", "country_code", "as_description"]
+
+
+def _parse_address(value: str):
+    """(version, integer) of a dotted/colon address or of an already integer encoded one."""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number < 2 ** 32 else 6), number
+    address = ipaddress.ip_address(value)
+    return address.version, int(address)
+
+
+def _asn(value):
+    value = (value or "").strip().upper().removeprefix("AS")
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def _columns(header):
+    lowered = [column.strip().lower() for column in header]
+    found = {}
+    for field, aliases in _COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                found[field] = lowered.index(alias)
+                break
+    return found
+
+
+class IntervalIndex:
+    """
+    Sorted, non-overlapping address ranges of one dataset, one table per address family.
+    A lookup is a bisect over the range starts; a sorted batch walks the table once.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._rows = {4: [], 6: []}
+        self._starts = {4: [], 6: []}
+        self._ends = {4: [], 6: []}
+        self._values = {4: [], 6: []}
+
+    def add(self, version: int, start: int, end: int, values: dict):
+        self._rows[version].append((start, end, values))
+
+    def freeze(self):
+        for version, rows in self._rows.items():
+            rows.sort(key=lambda row: row[0])
+            self._starts[version] = [start for start, _, _ in rows]
+            self._ends[version] = [end for _, end, _ in rows]
+            self._values[version] = [values for _, _, values in rows]
+        self._rows = {4: [], 6: []}
+        return self
+
+    def __len__(self):
+        return len(self._starts[4]) + len(self._starts[6])
+
+    def lookup_sorted(self, version: int, values: list):
+        """Match ascending integer addresses of one family; returns (range start, range end, fields) or None each."""
+        starts, ends, fields = self._starts[version], self._ends[version], self._values[version]
+        results = []
+        low = 0
+        for value in values:
+            # Every later address is at least as large, so the search never has to look behind `low`
+            index = bisect.bisect_right(starts, value, low) - 1
+            if index < 0 or value > ends[index]:
+                results.append(None)
+                continue
+            low = index
+            results.append((starts[index], ends[index], fields[index]))
+        return results
+
+
+def _owning_prefix(version, address, start, end):
+    """Smallest CIDR block of the matched range that holds the address (ranges need not be CIDR aligned)."""
+    cls = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    for network in ipaddress.summarize_address_range(cls(start), cls(end)):
+        if address in network:
+            return str(network)
+    return None
+
+
+def _read_rows(path):
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = "\t" if sample.count("\t") > sample.count(",") else ","
+        reader = csv.reader(f, delimiter=delimiter)
+        first = next(reader, None)
+        if first is None:
+            return [], {}
+        columns = _columns(first)
+        if not columns and len(first) == len(_IP2ASN_COLUMNS):
+            columns = _columns(_IP2ASN_COLUMNS)
+            rows = [first]
+        else:
+            rows = []
+        rows.extend(reader)
+    return rows, columns
+
+
+def load_locations(path: str):
+    """MaxMind *-Locations-*.csv: geoname_id -> country ISO code."""
+    rows, columns = _read_rows(path)
+    if "geoname" not in columns or "country" not in columns:
+        return {}
+    return {row[columns["geoname"]]: row[columns["country"]] for row in rows if len(row) > columns["country"]}
+
+
+def load_table(path: str, locations: dict = None) -> IntervalIndex:
+    """Load a range table (start/end columns) or a network table (CIDR column) into an IntervalIndex."""
+    rows, columns = _read_rows(path)
+    if "network" not in columns and not ("start" in columns and "end" in columns):
+        raise Exception(f"No address range columns in {path}")
+
+    index = IntervalIndex(os.path.basename(path))
+    for row in rows:
+        try:
+            if "network" in columns:
+                network = ipaddress.ip_network(row[columns["network"]].strip(), strict=False)
+                version, start, end = network.version, int(network.network_address), int(network.broadcast_address)
+            else:
+                version, start = _parse_address(row[columns["start"]])
+                _, end = _parse_address(row[columns["end"]])
+        except (ValueError, IndexError):
+            continue  # Skip malformed lines
+
+        values = {}
+        if "asn" in columns:
+            values["asn"] = _asn(row[columns["asn"]])
+        if "as_org" in columns and row[columns["as_org"]].strip() not in ("", "Not routed"):
+            values["as_org"] = row[columns["as_org"]].strip()
+        if "country" in columns and row[columns["country"]].strip() not in ("", "None", "ZZ"):
+            values["country"] = row[columns["country"]].strip()
+        elif "geoname" in columns and locations:
+            country = locations.get(row[columns["geoname"]])
+            if country:
+                values["country"] = country
+        if any(value is not None for value in values.values()):
+            index.add(version, start, end, values)
+
+    return index.freeze()
+
+
+class IPEnricher:
+    """
+    Attaches ASN, AS organisation, country and owning prefix to addresses from offline datasets.
+    Results are kept in an LRU cache shared by every scan of this process, so recurring
+    addresses cost a dictionary lookup and only new ones touch the interval indexes.
+    """
+
+    def __init__(self, tables: list = None, mmdb_readers: list = None, cache_size: int = CACHE_SIZE):
+        self.tables = tables or []
+        self.mmdb_readers = mmdb_readers or []
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.tables or self.mmdb_readers)
+
+    def enrich(self, ips) -> dict:
+        """Enrich a batch of addresses in one pass; returns ip -> {asn, as_org, country, prefix}."""
+        results = {}
+        pending = {4: [], 6: []}
+
+        with self._lock:
+            for ip in set(ips):
+                cached = self._cache.get(ip)
+                if cached is not None:
+                    self._cache.move_to_end(ip)
+                    results[ip] = cached
+                    self.hits += 1
+                    continue
+                try:
+                    address = ipaddress.ip_address(ip)
+                except ValueError:
+                    continue
+                pending[address.version].append((int(address), ip, address))
+                self.misses += 1
+
+        for version, entries in pending.items():
+            if not entries:
+                continue
+            entries.sort()
+            values = [value for value, _, _ in entries]
+            found = {ip: dict.fromkeys(FIELDS) for _, ip, _ in entries}
+
+            for table in self.tables:
+                for (_, ip, address), match in zip(entries, table.lookup_sorted(version, values)):
+                    if match is None:
+                        continue
+                    start, end, fields = match
+                    record = found[ip]
+                    for field, value in fields.items():
+                        if record.get(field) is None:
+                            record[field] = value
+                    if record["prefix"] is None:
+                        record["prefix"] = _owning_prefix(version, address, start, end)
+
+            for reader in self.mmdb_readers:
+                for _, ip, _ in entries:
+                    self._enrich_from_mmdb(reader, ip, found[ip])
+
+            results.update(found)
+
+        with self._lock:
+            for entries in pending.values():
+                for _, ip, _ in entries:
+                    self._cache[ip] = results[ip]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return results
+
+    @staticmethod
+    def _enrich_from_mmdb(reader, ip, record):
+        data, prefix_length = reader.get_with_prefix_len(ip)
+        if not data:
+            return
+        record["asn"] = record["asn"] or data.get("autonomous_system_number")
+        record["as_org"] = record["as_org"] or data.get("autonomous_system_organization")
+        country = data.get("country") or data.get("registered_country") or {}
+        record["country"] = record["country"] or country.get("iso_code")
+        if record["prefix"] is None:
+            record["prefix"] = str(ipaddress.ip_network(f"{ip}/{prefix_length}", strict=False))
+
+
+def load_enricher(data_dir: str = ENRICHMENT_DATA_DIR) -> IPEnricher:
+    """Load every dataset in `data_dir`: *.csv / *.tsv range or network tables, and *.mmdb when maxminddb is installed."""
+    if not os.path.isdir(data_dir):
+        return IPEnricher()
+
+    locations = {}
+    for path in glob.glob(os.path.join(data_dir, "*Locations*.csv")):
+        locations.update(load_locations(path))
+
+    tables = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.csv")) + glob.glob(os.path.join(data_dir, "*.tsv"))):
+        if "Locations" in os.path.basename(path):
+            continue
+        try:
+            tables.append(load_table(path, locations))
+            print(f"[+] Loaded {len(tables[-1])} ranges from {path}")
+        except Exception as e:
+            print(f"[!] Skipping enrichment dataset {path}: {e}")
+
+    readers = []
+    mmdb_paths = sorted(glob.glob(os.path.join(data_dir, "*.mmdb")))
+    if mmdb_paths and maxminddb is None:
+        print("[!] The maxminddb package is required for .mmdb enrichment datasets")
+    elif mmdb_paths:
+        readers = [maxminddb.open_database(path) for path in mmdb_paths]
+
+    return IPEnricher(tables, readers)
+
+
+_enricher = None
+_enricher_lock = threading.Lock()
+
+
+def get_enricher() -> IPEnricher:
+    global _enricher
+    with _enricher_lock:
+        if _enricher is None:
+            _enricher = load_enricher()
+    return _enricher
+
+
+def enrich_ips(ips) -> dict:
+    """Enrichment for the given addresses, or {} when no dataset is installed."""
+    enricher = get_enricher()
+    if not enricher.available:
+        return {}
+    return enricher.enrich(ips)
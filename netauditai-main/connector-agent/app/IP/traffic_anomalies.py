@@ -0,0 +1,171 @@
+import math
+
+HLL_PRECISION = 8  # 256 one-byte registers per counter, ~6.5% standard error
+MAX_SOURCES = 4096
+MAX_PAIRS = 16384
+
+PORT_SCAN_THRESHOLD = 100  # distinct destination ports from one source
+HOST_SWEEP_THRESHOLD = 50  # distinct destination hosts from one source
+BEACON_MIN_INTERVALS = 5
+BEACON_MIN_PERIOD = 10.0  # seconds; faster repeats are polling and keepalives, not check-ins
+BEACON_MIN_WINDOW = 300.0  # seconds a pair must be observed for; a ~10 s scan capture never qualifies
+BEACON_SCORE_THRESHOLD = 0.75  # tolerates the randomised sleep most implants add (~+-40% uniform jitter)
+
+_HASH_MASK = (1 << 64) - 1
+
+
+def _mix(value):
+    # splitmix64 finalizer: hash() of small ints is the int itself, which would leave the top bits empty
+    x = hash(value) & _HASH_MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _HASH_MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _HASH_MASK
+    return x ^ (x >> 31)
+
+
+class HyperLogLog:
+    """Fixed-size distinct counter: 2**precision bytes whatever the number of items added."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._rank_bits = 64 - precision
+        self._alpha = 0.7213 / (1 + 1.079 / self.size) if self.size >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[self.size]
+
+    def add(self, value):
+        hashed = _mix(value)
+        index = hashed >> self._rank_bits
+        remainder = hashed & ((1 << self._rank_bits) - 1)
+        rank = self._rank_bits - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        estimate = self._alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            return self.size * math.log(self.size / zeros)
+        return estimate
+
+
+class IntervalStats:
+    """Running mean/variance of the gaps between connection starts (Welford), constant memory."""
+
+    __slots__ = ("first", "last", "count", "mean", "m2")
+
+    def __init__(self, timestamp: float):
+        self.first = timestamp
+        self.last = timestamp
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, timestamp: float):
+        interval = timestamp - self.last
+        self.last = timestamp
+        if interval <= 0:
+            return
+        self.count += 1
+        delta = interval - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (interval - self.mean)
+
+    def score(self):
+        """1.0 for perfectly regular intervals, dropping towards 0 as the coefficient of variation grows."""
+        if self.count < 2 or self.mean <= 0:
+            return 0.0
+        deviation = math.sqrt(self.m2 / (self.count - 1))
+        return max(0.0, 1.0 - deviation / self.mean)
+
+
+def _split_endpoint(endpoint: str):
+    ip, _, port = endpoint.rpartition(":")
+    return ip, int(port) if port.isdigit() else 0
+
+
+def _orient(a: str, b: str):
+    """Return (client, server) endpoints, taking the side with the lower port as the server."""
+    a_ip, a_port = _split_endpoint(a)
+    b_ip, b_port = _split_endpoint(b)
+    if a_port < b_port:
+        return (b_ip, b_port), (a_ip, a_port)
+    return (a_ip, a_port), (b_ip, b_port)
+
+
+class TrafficAnomalyDetector:
+    """
+    Streaming scan and beacon detection over connection events.
+    Memory is bounded by MAX_SOURCES HyperLogLog pairs and MAX_PAIRS interval trackers.
+    """
+
+    def __init__(self, max_sources: int = MAX_SOURCES, max_pairs: int = MAX_PAIRS):
+        self.max_sources = max_sources
+        self.max_pairs = max_pairs
+        self.sources = {}
+        self.pairs = {}
+        self.events = 0
+        self.untracked_events = 0
+
+    def observe(self, src_ip: str, dst_ip: str, dst_port: int, timestamp: float):
+        """Record one connection from src_ip to dst_ip:dst_port starting at `timestamp` (seconds)."""
+        self.events += 1
+
+        counters = self.sources.get(src_ip)
+        if counters is None:
+            if len(self.sources) >= self.max_sources:
+                self.untracked_events += 1
+                return
+            counters = self.sources[src_ip] = (HyperLogLog(), HyperLogLog(), [0])
+        ports, hosts, connections = counters
+        ports.add(dst_port)
+        hosts.add(dst_ip)
+        connections[0] += 1
+
+        key = (src_ip, dst_ip, dst_port)
+        intervals = self.pairs.get(key)
+        if intervals is None:
+            if len(self.pairs) < self.max_pairs:
+                self.pairs[key] = IntervalStats(timestamp)
+        else:
+            intervals.add(timestamp)
+
+    def observe_conversation(self, conversation: dict):
+        (client_ip, _), (server_ip, server_port) = _orient(conversation["source"], conversation["destination"])
+        self.observe(client_ip, server_ip, server_port, conversation.get("relative_start", 0.0))
+
+    def findings(self):
+        results = {}
+        for src_ip, (ports, hosts, connections) in self.sources.items():
+            distinct_ports = round(ports.count())
+            distinct_hosts = round(hosts.count())
+            if distinct_ports >= PORT_SCAN_THRESHOLD:
+                results[f"{src_ip} port-scan"] = (
+                    f"[!] Possible port scan: ~{distinct_ports} distinct destination ports "
+                    f"across ~{distinct_hosts} hosts in {connections[0]} connections."
+                )
+            if distinct_hosts >= HOST_SWEEP_THRESHOLD:
+                results[f"{src_ip} host-sweep"] = (
+                    f"[!] Possible host sweep: ~{distinct_hosts} distinct destination hosts "
+                    f"in {connections[0]} connections."
+                )
+
+        for (src_ip, dst_ip, dst_port), intervals in self.pairs.items():
+            if (intervals.count < BEACON_MIN_INTERVALS or intervals.mean < BEACON_MIN_PERIOD
+                    or intervals.last - intervals.first < BEACON_MIN_WINDOW):
+                continue
+            score = intervals.score()
+            if score >= BEACON_SCORE_THRESHOLD:
+                results[f"{src_ip} -> {dst_ip}:{dst_port} beacon"] = (
+                    f"[!] Possible beaconing: {intervals.count + 1} connections every "
+                    f"{intervals.mean:.2f}s on average (periodicity score {score:.2f})."
+                )
+        return results
+
+
+def detect_anomalies(conversations):
+    """Run the detectors over conversation rows (as parsed from tshark's conv,tcp table) in start order."""
+    detector = TrafficAnomalyDetector()
+    for conversation in sorted(conversations, key=lambda conv: conv.get("relative_start", 0.0)):
+        detector.observe_conversation(conversation)
+    return detector.findings()
@@ -0,0 +1,227 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Window length in seconds -> number of closed windows kept in history
+DEFAULT_WINDOWS = {
+    60: 60,    # 1 min windows, last hour
+    300: 36,   # 5 min windows, last 3 hours
+    3600: 24,  # 1 h windows, last day
+}
+MAX_FLOWS_PER_WINDOW = 1024
+TOP_FLOWS = 10
+
+TSHARK_FIELDS = ["frame.time_epoch", "ip.src", "tcp.srcport", "ip.dst", "tcp.dstport", "frame.len"]
+
+
+def build_monitor_command(interfaces, capture_filter="tcp"):
+    """Build a tshark command that prints one comma separated line per packet, unbuffered."""
+    interface_args = " ".join(f"-i {interface}" for interface in interfaces)
+    field_args = " ".join(f"-e {field}" for field in TSHARK_FIELDS)
+    return f"tshark {interface_args} -l -n -f '{capture_filter}' -T fields -E separator=, {field_args}"
+
+
+def parse_packet_line(line):
+    """Parse a tshark fields line into (timestamp, source, destination, length), or None."""
+    parts = line.strip().split(",")
+    if len(parts) != len(TSHARK_FIELDS):
+        return None
+
+    epoch, src_ip, src_port, dst_ip, dst_port, length = parts
+    if not src_ip or not dst_ip:
+        return None
+
+    try:
+        return float(epoch), f"{src_ip}:{src_port}", f"{dst_ip}:{dst_port}", int(length)
+    except ValueError:
+        return None
+
+
+class FlowWindow:
+    """Aggregated TCP flow counters for one fixed time window."""
+
+    def __init__(self, start: float, length: int, max_flows: int = MAX_FLOWS_PER_WINDOW):
+        self.start = start
+        self.length = length
+        self.max_flows = max_flows
+        self.packets = 0
+        self.bytes = 0
+        self.flows = {}
+        self.untracked_packets = 0
+        self.untracked_bytes = 0
+
+    @property
+    def end(self):
+        return self.start + self.length
+
+    def add(self, source: str, destination: str, size: int):
+        self.packets += 1
+        self.bytes += size
+
+        # Both directions of a conversation share one key, like tshark's conv,tcp table
+        key = (source, destination) if source <= destination else (destination, source)
+        counters = self.flows.get(key)
+        if counters is None:
+            if len(self.flows) >= self.max_flows:
+                self.untracked_packets += 1
+                self.untracked_bytes += size
+                return
+            counters = self.flows[key] = [0, 0]
+
+        counters[0] += 1
+        counters[1] += size
+
+    def to_dict(self, top: int = TOP_FLOWS):
+        top_flows = sorted(self.flows.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return {
+            "start": datetime.fromtimestamp(self.start, timezone.utc).isoformat(),
+            "end": datetime.fromtimestamp(self.end, timezone.utc).isoformat(),
+            "total_packets": self.packets,
+            "total_bytes": self.bytes,
+            "flow_count": len(self.flows),
+            "average_throughput": (self.bytes * 8) / self.length,
+            "untracked_packets": self.untracked_packets,
+            "untracked_bytes": self.untracked_bytes,
+            "top_flows": [
+                {
+                    "source": source,
+                    "destination": destination,
+                    "total_frames": frames,
+                    "total_bytes": size,
+                }
+                for (source, destination), (frames, size) in top_flows
+            ],
+        }
+
+
+class RollingWindow:
+    """A current FlowWindow plus a bounded history of closed windows of the same length."""
+
+    def __init__(self, length: int, history: int, max_flows: int = MAX_FLOWS_PER_WINDOW):
+        self.length = length
+        self.max_flows = max_flows
+        self.current = None
+        self.history = deque(maxlen=history)
+
+    def _aligned_start(self, timestamp: float):
+        return timestamp - (timestamp % self.length)
+
+    def advance(self, timestamp: float):
+        """Close the current window if `timestamp` falls past its end."""
+        if self.current is None:
+            self.current = FlowWindow(self._aligned_start(timestamp), self.length, self.max_flows)
+        elif timestamp >= self.current.end:
+            self.history.append(self.current)
+            self.current = FlowWindow(self._aligned_start(timestamp), self.length, self.max_flows)
+
+    def add(self, timestamp: float, source: str, destination: str, size: int):
+        self.advance(timestamp)
+        self.current.add(source, destination, size)
+
+    def snapshot(self, history: int = None):
+        closed = list(self.history)
+        if history is not None:
+            closed = closed[-history:] if history > 0 else []
+        return {
+            "window": self.length,
+            "current": self.current.to_dict() if self.current else None,
+            "history": [window.to_dict() for window in closed],
+        }
+
+
+class FlowMonitor:
+    """
+    Keeps one tshark capture open on a device and folds every packet into rolling windows.
+    Memory is bounded by the window history lengths and MAX_FLOWS_PER_WINDOW.
+    """
+
+    def __init__(self, connector, interfaces, windows: dict = None, max_flows: int = MAX_FLOWS_PER_WINDOW,
+                 capture_filter: str = "tcp"):
+        self.connector = connector
+        self.interfaces = list(interfaces)
+        self.capture_filter = capture_filter
+        windows = windows or DEFAULT_WINDOWS
+        self.windows = {
+            length: RollingWindow(length, history, max_flows)
+            for length, history in windows.items()
+        }
+        self.started_at = None
+        self.last_packet_at = None
+        self.last_packet_seen = None
+        self.packets_seen = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.started_at = time.time()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"[+] Monitoring {self.connector.ip} on {', '.join(self.interfaces)}")
+
+    def _run(self):
+        command = build_monitor_command(self.interfaces, self.capture_filter)
+        try:
+            for line in self.connector.stream_with_pty(command, use_sudo=True):
+                if self._stopped.is_set():
+                    break
+                packet = parse_packet_line(line)
+                if packet:
+                    self.feed(*packet)
+        except Exception as e:
+            if not self._stopped.is_set():
+                print(f"[!] Monitor for {self.connector.ip} stopped: {e}")
+                self.error = str(e)
+
+    def feed(self, timestamp: float, source: str, destination: str, size: int):
+        with self._lock:
+            for window in self.windows.values():
+                window.add(timestamp, source, destination, size)
+            self.packets_seen += 1
+            self.last_packet_at = timestamp
+            self.last_packet_seen = time.time()
+
+    def _capture_now(self):
+        # Remote capture clock, extrapolated from the last packet so idle windows still close
+        if self.last_packet_at is None:
+            return None
+        return self.last_packet_at + (time.time() - self.last_packet_seen)
+
+    def stats(self, window: int = None, history: int = None):
+        with self._lock:
+            now = self._capture_now()
+            selected = [self.windows[window]] if window is not None else self.windows.values()
+            windows = []
+            for rolling in selected:
+                if now is not None:
+                    rolling.advance(now)
+                windows.append(rolling.snapshot(history))
+
+        return {
+            "ip": self.connector.ip,
+            "interfaces": self.interfaces,
+            "running": self.running,
+            "error": self.error,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat() if self.started_at else None,
+            "packets_seen": self.packets_seen,
+            "windows": windows,
+        }
+
+    def stop(self):
+        self._stopped.set()
+        try:
+            self.connector.close()
+        except Exception as e:
+            print(f"[!] Error closing monitor connection: {e}")
+        if self._thread:
+            self._thread.join(timeout=5)
+        print(f"[+] Monitor for {self.connector.ip} stopped")
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import threading
+import time
+
+from .nmap_scan import parse_nmap_output
+
+FINGERPRINT_CACHE_FILE = "fingerprint_cache.json"
+FINGERPRINT_TTL = 86400  # 1 day
+
+_ip_pattern = re.compile(r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})")
+_mac_pattern = re.compile(r"MAC Address: ([0-9A-Fa-f:]{17})")
+
+
+def _host_ip(address):
+    """'router.lan (192.168.1.1)' and '192.168.1.1' both give '192.168.1.1'."""
+    matches = _ip_pattern.findall(address or "")
+    return matches[-1] if matches else address
+
+
+def parse_mac_addresses(output):
+    """Map host IP -> MAC address for every host nmap could see on the local segment."""
+    macs = {}
+    for section in output.split("Nmap scan report for ")[1:]:
+        mac_match = _mac_pattern.search(section)
+        if mac_match:
+            macs[_host_ip(section.split("\n", 1)[0])] = mac_match.group(1).upper()
+    return macs
+
+
+class FingerprintCache:
+    """
+    Service/version data per (IP, MAC, port) and OS data per (IP, MAC), persisted to disk.
+    Keying on the MAC as well means a different machine taking over an IP is never served stale data.
+    """
+
+    def __init__(self, cache_file: str = FINGERPRINT_CACHE_FILE, ttl: int = FINGERPRINT_TTL):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] Failed to load fingerprint cache: {e}")
+            self.entries = {}
+
+    def save(self):
+        with self._lock:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_file, self.cache_file)
+
+    def _fresh(self, fetched_at, now):
+        return fetched_at is not None and now - fetched_at < self.ttl
+
+    def lookup_port(self, ip, mac, port, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self.entries.get(f"{ip}|{mac}", {}).get("ports", {}).get(str(port))
+        if entry and self._fresh(entry.get("fetched_at"), now):
+            return entry
+        return None
+
+    def lookup_os(self, ip, mac, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self.entries.get(f"{ip}|{mac}", {})
+        if "os" in entry and self._fresh(entry.get("os_fetched_at"), now):
+            return entry
+        return None
+
+    def store(self, ip, mac, host_info, ports, with_os, now=None):
+        """Record a -sV (and optionally -O) result for the probed ports of one host."""
+        now = now if now is not None else time.time()
+        probed = {str(port) for port in ports}
+        with self._lock:
+            entry = self.entries.setdefault(f"{ip}|{mac}", {"ports": {}})
+            for port_info in host_info.get("ports", []):
+                if port_info["portid"] in probed:
+                    entry["ports"][port_info["portid"]] = {
+                        "service": port_info["service"],
+                        "version": port_info["version"],
+                        "fetched_at": now,
+                    }
+            if with_os:
+                entry["os"] = host_info.get("os")
+                entry["os_fetched_at"] = now
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_fingerprint_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FingerprintCache()
+    return _default_cache
+
+
+def _probe(run_command, targets, options, timing):
+    """Run one nmap probe over the union of the listed ports of `targets` (ip -> ports)."""
+    ports = sorted({int(port) for host_ports in targets.values() for port in host_ports})
+    port_option = f"-p {','.join(str(port) for port in ports)} " if ports else ""
+    output = run_command(f"nmap {options} {timing} {port_option}{' '.join(targets)}")
+    if not output:
+        return {}
+    return {_host_ip(host["address"]): host for host in parse_nmap_output(output)["hosts"]}
+
+
+def fingerprint_scan(run_command, target, cache: FingerprintCache = None, force_refresh=False, timing="-T5",
+                     discovery_options="", time_left=None, min_probe_time=0):
+    """
+    Discover open ports with a fast SYN scan, then only run version/OS detection for ports and hosts
+    the cache has no fresh fingerprint for. Returns the same structure as parse_nmap_output.
+    When `time_left()` drops below `min_probe_time` the remaining probes are skipped and the
+    discovery results (plus whatever the cache has) are returned.
+    """
+    cache = cache or get_fingerprint_cache()
+    now = time.time()
+
+    fast_output = run_command(f"nmap -sS {timing} {discovery_options + ' ' if discovery_options else ''}{target}")
+    if not fast_output:
+        return {"hosts": []}
+
+    discovered = parse_nmap_output(fast_output)["hosts"]
+    macs = parse_mac_addresses(fast_output)
+
+    stale_ports = {}  # ip -> open ports without a fresh service fingerprint
+    stale_os = {}  # ip -> all open ports, OS detection works best with every open port
+    for host in discovered:
+        ip = _host_ip(host["address"])
+        mac = macs.get(ip, "")
+        open_ports = [port["portid"] for port in host["ports"]]
+        stale = [
+            port for port in open_ports
+            if force_refresh or cache.lookup_port(ip, mac, port, now) is None
+        ]
+        if stale:
+            stale_ports[ip] = stale
+        if open_ports and (force_refresh or cache.lookup_os(ip, mac, now) is None):
+            stale_os[ip] = open_ports
+
+    # Hosts needing both get a single -sV -O pass, the rest only the probe they need
+    groups = [
+        ("-sV -O", {ip: stale_os[ip] for ip in stale_os if ip in stale_ports}, True, True),
+        ("-sV", {ip: ports for ip, ports in stale_ports.items() if ip not in stale_os}, True, False),
+        ("-O", {ip: ports for ip, ports in stale_os.items() if ip not in stale_ports}, False, True),
+    ]
+    skipped = set()
+    for options, targets, versions, os_detection in groups:
+        if not targets:
+            continue
+        if time_left is not None and time_left() < min_probe_time:
+            print(f"[!] Not enough time left for nmap {options} on {len(targets)} hosts, skipping")
+            skipped.update(targets)
+            continue
+        probed = _probe(run_command, targets, options, timing)
+        for ip, ports in targets.items():
+            if ip in probed:
+                cache.store(ip, macs.get(ip, ""), probed[ip], ports if versions else [], os_detection, now)
+
+    refreshed_hosts = (stale_ports.keys() | stale_os.keys()) - skipped
+    print(f"[INFO] Fingerprinted {len(refreshed_hosts)} of {len(discovered)} hosts, "
+          f"{len(discovered) - len(refreshed_hosts)} served from cache")
+    cache.save()
+
+    scan_results = {"hosts": []}
+    for host in discovered:
+        ip = _host_ip(host["address"])
+        mac = macs.get(ip, "")
+        refreshed = set() if ip in skipped else (
+            set(stale_ports.get(ip, [])) | (set(stale_os[ip]) if ip in stale_ports and ip in stale_os else set())
+        )
+        os_entry = cache.lookup_os(ip, mac, now)
+
+        host_info = {
+            "address": host["address"],
+            "ports": [],
+            "os": os_entry["os"] if os_entry else host["os"],
+        }
+        for port in host["ports"]:
+            cached = cache.lookup_port(ip, mac, port["portid"], now)
+            host_info["ports"].append({
+                "portid": port["portid"],
+                "state": "open",
+                "service": cached["service"] if cached else port["service"],
+                "version": cached["version"] if cached else port["version"],
+                "cached": cached is not None and port["portid"] not in refreshed,
+            })
+        scan_results["hosts"].append(host_info)
+
+    return scan_results
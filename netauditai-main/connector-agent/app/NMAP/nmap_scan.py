@@ -26,10 +26,9 @@ def parse_nmap_output(output):
 
     # Regular expressions to parse the Nmap output
     host_pattern = re.compile(r"Nmap scan report for (.*?)")
-    port_pattern = re.compile(r"(\d+)/tcp\s+open\s+(\w+)(?:\s+(.+?))?\n")
+    port_pattern = re.compile(r"(\d+)/tcp[ \t]+open[ \t]+(\S+)(?:[ \t]+(.+?))?[ \t]*\n")
     os_pattern = re.compile(r"Running: (.*)")
 
-    output = output["Nmap scan report for".__len__():]  # Trim output to start from the first host report
     # Split the output by host sections, ignoring "host is up" lines
     hosts = host_pattern.split(output)[1:]
 
@@ -65,7 +64,7 @@ def parse_nmap_output(output):
                 "portid": match.group(1),
                 "state": "open",
                 "service": match.group(2),
-                "version": match.group(3).strip() if match.group(2) else ""
+                "version": match.group(3).strip() if match.group(3) else ""
             }
             host_info["ports"].append(port_info)
 
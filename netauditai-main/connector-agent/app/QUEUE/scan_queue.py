@@ -0,0 +1,385 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from cryptography.fernet import Fernet, InvalidToken
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_QUEUE_URL = "sqlite:///scan_queue.db"
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 30  # seconds, multiplied by the attempt number
+QUEUE_KEY_ENV = "SCAN_QUEUE_KEY"
+CREDENTIAL_FIELDS = ("private_key", "sudo_pwd")
+
+
+def _now():
+    return time.time()
+
+
+class CredentialCipher:
+    """
+    Encrypts the credential fields of a job payload with a key every producer and consumer gets
+    from the environment, so neither the SQLite file nor Redis ever holds them in plaintext.
+    """
+
+    def __init__(self, key: str):
+        self._fernet = Fernet(key)
+
+    @classmethod
+    def from_env(cls):
+        key = os.getenv(QUEUE_KEY_ENV)
+        if not key:
+            raise Exception(
+                f"Set {QUEUE_KEY_ENV} to a key from cryptography.fernet.Fernet.generate_key(), "
+                "queued scans carry credentials that must be encrypted"
+            )
+        return cls(key)
+
+    def seal(self, payload: dict) -> dict:
+        return {
+            field: self._fernet.encrypt(value.encode()).decode()
+            if field in CREDENTIAL_FIELDS and isinstance(value, str) else value
+            for field, value in payload.items()
+        }
+
+    def open(self, payload: dict) -> dict:
+        try:
+            return {
+                field: self._fernet.decrypt(value.encode()).decode()
+                if field in CREDENTIAL_FIELDS and isinstance(value, str) else value
+                for field, value in payload.items()
+            }
+        except InvalidToken:
+            raise Exception(f"Cannot decrypt the job credentials, check that {QUEUE_KEY_ENV} matches the producer's")
+
+
+class SQLiteScanQueue:
+    """
+    Scan job queue in a single SQLite file, for one node running several worker processes.
+    A claimed job stays invisible until its lease (visibility timeout) expires; if the worker
+    neither acks nor extends it by then, the job is handed to the next worker.
+    """
+
+    def __init__(self, path: str, cipher: CredentialCipher = None):
+        self.path = path
+        self.cipher = cipher or CredentialCipher.from_env()
+        self._local = threading.local()
+        self._db().executescript("""
+            CREATE TABLE IF NOT EXISTS scan_jobs (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                visible_at REAL NOT NULL,
+                owner TEXT,
+                error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scan_jobs_ready ON scan_jobs (status, visible_at);
+        """)
+
+    def _db(self):
+        # sqlite3 connections must not be shared across threads, so each thread gets its own
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _connection(self):
+        return _Transaction(self._db())
+
+    def enqueue(self, payload: dict, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        job_id = uuid.uuid4().hex
+        now = _now()
+        with self._connection() as db:
+            db.execute(
+                "INSERT INTO scan_jobs (id, payload, status, max_attempts, visible_at, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(self.cipher.seal(payload)), max_attempts, now, now, now)
+            )
+        return job_id
+
+    def claim(self, worker_id: str, visibility_timeout: float):
+        """Lease the oldest visible job to `worker_id`; returns (job_id, payload, attempt) or None."""
+        now = _now()
+        with self._connection() as db:
+            # Leases that expired on their last attempt will never be retried
+            db.execute(
+                "UPDATE scan_jobs SET status = 'failed', payload = '{}', error = 'visibility timeout expired', "
+                "updated_at = ? WHERE status = 'running' AND visible_at <= ? AND attempts >= max_attempts",
+                (now, now)
+            )
+            row = db.execute(
+                "SELECT id, payload, attempts FROM scan_jobs "
+                "WHERE status IN ('queued', 'running') AND visible_at <= ? ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            job_id, payload, attempts = row
+            db.execute(
+                "UPDATE scan_jobs SET status = 'running', attempts = ?, owner = ?, visible_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (attempts + 1, worker_id, now + visibility_timeout, now, job_id)
+            )
+        return job_id, self.cipher.open(json.loads(payload)), attempts + 1
+
+    def extend(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        now = _now()
+        with self._connection() as db:
+            updated = db.execute(
+                "UPDATE scan_jobs SET visible_at = ?, updated_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (now + visibility_timeout, now, job_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def ack(self, job_id: str, worker_id: str, result: str) -> bool:
+        """Store the result and complete the job; credentials in the payload are dropped."""
+        with self._connection() as db:
+            updated = db.execute(
+                "UPDATE scan_jobs SET status = 'done', payload = '{}', result = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (result, _now(), job_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def nack(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Give the job back for a retry with backoff, or fail it once it ran out of attempts."""
+        now = _now()
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT attempts, max_attempts FROM scan_jobs WHERE id = ? AND owner = ? AND status = 'running'",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+
+            attempts, max_attempts = row
+            if attempts >= max_attempts:
+                db.execute(
+                    "UPDATE scan_jobs SET status = 'failed', payload = '{}', error = ?, updated_at = ? WHERE id = ?",
+                    (error, now, job_id)
+                )
+            else:
+                db.execute(
+                    "UPDATE scan_jobs SET status = 'queued', owner = NULL, error = ?, visible_at = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (error, now + RETRY_BACKOFF * attempts, now, job_id)
+                )
+        return True
+
+    def get(self, job_id: str):
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT status, attempts, max_attempts, error, result, created_at, updated_at FROM scan_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        status, attempts, max_attempts, error, result, created_at, updated_at = row
+        return {
+            "id": job_id,
+            "status": status,
+            "attempts": attempts,
+            "max_attempts": max_attempts,
+            "error": error,
+            "result": json.loads(result) if result else None,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block, so concurrent claims never hand out the same job."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_CLAIM_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then return nil end
+local job_key = KEYS[3] .. job_id
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+local attempts = redis.call('HINCRBY', job_key, 'attempts', 1)
+redis.call('HSET', job_key, 'status', 'running', 'owner', ARGV[2], 'updated_at', ARGV[3])
+return {job_id, redis.call('HGET', job_key, 'payload'), attempts}
+"""
+
+# Ack, nack, extend and requeue check and change a job in one script, so a worker whose lease
+# expired can never complete or give back a job that was already handed to someone else
+_LEASE_CHECK = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) or redis.call('HGET', KEYS[2], 'owner') ~= ARGV[2] then
+    return 0
+end
+"""
+
+_EXTEND_SCRIPT = _LEASE_CHECK + """
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+_ACK_SCRIPT = _LEASE_CHECK + """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], 'status', 'done', 'payload', '{}', 'owner', '', 'result', ARGV[3], 'error', '',
+           'updated_at', ARGV[4])
+return 1
+"""
+
+_NACK_SCRIPT = _LEASE_CHECK + """
+redis.call('ZREM', KEYS[1], ARGV[1])
+local attempts = tonumber(redis.call('HGET', KEYS[2], 'attempts')) or 0
+local max_attempts = tonumber(redis.call('HGET', KEYS[2], 'max_attempts')) or tonumber(ARGV[6])
+if attempts >= max_attempts then
+    redis.call('HSET', KEYS[2], 'status', 'failed', 'payload', '{}', 'owner', '', 'error', ARGV[3], 'updated_at', ARGV[4])
+else
+    redis.call('HSET', KEYS[2], 'status', 'queued', 'owner', '', 'error', ARGV[3], 'updated_at', ARGV[4])
+    redis.call('ZADD', KEYS[3], tonumber(ARGV[4]) + tonumber(ARGV[5]) * attempts, ARGV[1])
+end
+return 1
+"""
+
+_REQUEUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], job_id)
+    local job_key = KEYS[3] .. job_id
+    local attempts = tonumber(redis.call('HGET', job_key, 'attempts')) or 0
+    local max_attempts = tonumber(redis.call('HGET', job_key, 'max_attempts')) or tonumber(ARGV[2])
+    if attempts >= max_attempts then
+        redis.call('HSET', job_key, 'status', 'failed', 'payload', '{}', 'owner', '',
+                   'error', 'visibility timeout expired', 'updated_at', ARGV[1])
+    else
+        redis.call('HSET', job_key, 'status', 'queued', 'owner', '', 'updated_at', ARGV[1])
+        redis.call('RPUSH', KEYS[2], job_id)
+    end
+end
+return #expired
+"""
+
+
+class RedisScanQueue:
+    """
+    Scan job queue in Redis for workers spread over several hosts.
+    Pending ids live in a list, leased ids in a sorted set scored by lease expiry.
+    """
+
+    def __init__(self, url: str, prefix: str = "netaudit:scan", cipher: CredentialCipher = None):
+        if redis is None:
+            raise Exception("The redis package is required for a redis:// scan queue")
+        self.cipher = cipher or CredentialCipher.from_env()
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.pending_key = f"{prefix}:pending"
+        self.leased_key = f"{prefix}:leased"
+        self.job_prefix = f"{prefix}:job:"
+        self._claim = self.client.register_script(_CLAIM_SCRIPT)
+        self._extend = self.client.register_script(_EXTEND_SCRIPT)
+        self._ack = self.client.register_script(_ACK_SCRIPT)
+        self._nack = self.client.register_script(_NACK_SCRIPT)
+        self._requeue = self.client.register_script(_REQUEUE_SCRIPT)
+
+    def _job_key(self, job_id):
+        return f"{self.job_prefix}{job_id}"
+
+    def enqueue(self, payload: dict, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        job_id = uuid.uuid4().hex
+        now = _now()
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "payload": json.dumps(self.cipher.seal(payload)),
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "created_at": now,
+            "updated_at": now,
+        })
+        pipe.lpush(self.pending_key, job_id)
+        pipe.execute()
+        return job_id
+
+    def _requeue_expired(self, now):
+        self._requeue(keys=[self.leased_key, self.pending_key, self.job_prefix], args=[now, DEFAULT_MAX_ATTEMPTS])
+
+    def _delayed_key(self):
+        return f"{self.pending_key}:delayed"
+
+    def _release_delayed(self, now):
+        for job_id in self.client.zrangebyscore(self._delayed_key(), "-inf", now):
+            if self.client.zrem(self._delayed_key(), job_id):
+                self.client.rpush(self.pending_key, job_id)
+
+    def claim(self, worker_id: str, visibility_timeout: float):
+        now = _now()
+        self._requeue_expired(now)
+        self._release_delayed(now)
+        claimed = self._claim(
+            keys=[self.pending_key, self.leased_key, self.job_prefix],
+            args=[now + visibility_timeout, worker_id, now]
+        )
+        if not claimed:
+            return None
+        job_id, payload, attempts = claimed
+        return job_id, self.cipher.open(json.loads(payload)), int(attempts)
+
+    def _lease_keys(self, job_id):
+        return [self.leased_key, self._job_key(job_id)]
+
+    def extend(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        return bool(self._extend(keys=self._lease_keys(job_id), args=[job_id, worker_id, _now() + visibility_timeout]))
+
+    def ack(self, job_id: str, worker_id: str, result: str) -> bool:
+        """Store the result and complete the job; credentials in the payload are dropped."""
+        return bool(self._ack(keys=self._lease_keys(job_id), args=[job_id, worker_id, result, _now()]))
+
+    def nack(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Give the job back for a retry with backoff, or fail it once it ran out of attempts."""
+        return bool(self._nack(
+            keys=self._lease_keys(job_id) + [self._delayed_key()],
+            args=[job_id, worker_id, error, _now(), RETRY_BACKOFF, DEFAULT_MAX_ATTEMPTS]
+        ))
+
+    def get(self, job_id: str):
+        job = self.client.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        return {
+            "id": job_id,
+            "status": job.get("status"),
+            "attempts": int(job.get("attempts", 0)),
+            "max_attempts": int(job.get("max_attempts", DEFAULT_MAX_ATTEMPTS)),
+            "error": job.get("error") or None,
+            "result": json.loads(job["result"]) if job.get("result") else None,
+            "created_at": float(job.get("created_at", 0)),
+            "updated_at": float(job.get("updated_at", 0)),
+        }
+
+
+def open_scan_queue(url: str = None):
+    """redis://... for a shared Redis, sqlite:///path (the default) for a single node."""
+    url = url or os.getenv("SCAN_QUEUE_URL", DEFAULT_QUEUE_URL)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisScanQueue(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteScanQueue(url[len("sqlite:///"):])
+    raise Exception(f"Unsupported scan queue URL: {url}")
@@ -0,0 +1,90 @@
+import os
+import socket
+import threading
+import uuid
+
+DEFAULT_VISIBILITY_TIMEOUT = 300
+POLL_INTERVAL = 2.0
+
+
+class ScanWorker:
+    """
+    Pulls scan jobs from a shared queue and runs them one at a time.
+    While a job runs its lease is extended every third of the visibility timeout, so only a
+    worker that died (or hung past the timeout) gives its job back to the queue.
+    """
+
+    def __init__(self, queue, run_job, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+                 poll_interval: float = POLL_INTERVAL, worker_id: str = None):
+        self.queue = queue
+        self.run_job = run_job
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"[+] Scan worker {self.worker_id} started")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval * 2)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                if not self.run_once():
+                    self._stopped.wait(self.poll_interval)
+            except Exception as e:
+                print(f"[!] Scan worker {self.worker_id} error: {e}")
+                self._stopped.wait(self.poll_interval)
+
+    def run_once(self) -> bool:
+        """Claim and run a single job; returns False when the queue had nothing visible."""
+        claimed = self.queue.claim(self.worker_id, self.visibility_timeout)
+        if claimed is None:
+            return False
+
+        job_id, payload, attempt = claimed
+        print(f"[+] Worker {self.worker_id} running job {job_id} (attempt {attempt})")
+
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, finished), daemon=True)
+        heartbeat.start()
+        try:
+            result = self.run_job(payload)
+        except Exception as e:
+            finished.set()
+            print(f"[!] Job {job_id} failed: {e}")
+            self.queue.nack(job_id, self.worker_id, str(e))
+            self.jobs_failed += 1
+            return True
+        finished.set()
+
+        if not self.queue.ack(job_id, self.worker_id, result):
+            print(f"[!] Lost the lease on job {job_id} before it finished, result discarded")
+        self.jobs_done += 1
+        return True
+
+    def _heartbeat(self, job_id, finished: threading.Event):
+        interval = self.visibility_timeout / 3
+        while not finished.wait(interval):
+            try:
+                extended = self.queue.extend(job_id, self.worker_id, self.visibility_timeout)
+            except Exception as e:
+                # A transient queue error must not end the heartbeat, or the lease runs out mid-scan
+                print(f"[!] Failed to extend the lease on job {job_id}, retrying: {e}")
+                interval = min(self.poll_interval, self.visibility_timeout / 3)
+                continue
+            if not extended:
+                return
+            interval = self.visibility_timeout / 3
@@ -0,0 +1,265 @@
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+STATE_FILE = "scan_schedule_state.json"
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MIN_INTERVAL = 300  # never scan the same device more than once per 5 minutes
+TICK = 1.0
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+class ScanSchedule:
+    """A recurring scan of one device or a group of devices."""
+
+    def __init__(self, schedule_id: str, ips: list[str], interval: int, jitter: int = 0,
+                 priority: str = "normal", min_interval: int = DEFAULT_MIN_INTERVAL,
+                 credentials: dict = None, next_run: float = None, base_run: float = None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        if interval <= 0:
+            raise ValueError("Interval must be positive")
+
+        self.id = schedule_id
+        self.ips = list(ips)
+        self.interval = interval
+        self.jitter = max(0, min(jitter, interval))
+        self.priority = priority
+        self.min_interval = min_interval
+        # Credentials are only kept in memory, never written to the state file
+        self.credentials = credentials
+        # base_run is the un-jittered slot and advances by whole intervals; only next_run, the
+        # dispatch time, is jittered, so the offset never accumulates from one run to the next
+        self.base_run = base_run if base_run is not None else (next_run if next_run is not None else time.time())
+        self.next_run = next_run if next_run is not None else self.base_run + self._jitter()
+        self.last_run = None
+        self.missed_runs = 0
+
+    def _jitter(self):
+        return random.uniform(0, self.jitter) if self.jitter else 0.0
+
+    def reschedule(self, now: float):
+        """Advance to the first slot after `now`, coalescing every slot that was missed into the run just taken."""
+        due = self.base_run
+        skipped = int((now - due) // self.interval) if now > due else 0
+        self.missed_runs += skipped
+        self.base_run = due + (skipped + 1) * self.interval
+        self.next_run = self.base_run + self._jitter()
+
+    def to_state(self):
+        return {
+            "ips": self.ips,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "priority": self.priority,
+            "min_interval": self.min_interval,
+            "next_run": self.next_run,
+            "base_run": self.base_run,
+            "last_run": self.last_run,
+            "missed_runs": self.missed_runs,
+        }
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "ips": self.ips,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "priority": self.priority,
+            "min_interval": self.min_interval,
+            "next_run": _isoformat(self.next_run),
+            "last_run": _isoformat(self.last_run),
+            "missed_runs": self.missed_runs,
+            "credentials_required": self.credentials is None,
+        }
+
+
+class ScanScheduler:
+    """
+    Runs ScanSchedules in background threads.
+    Due device scans are queued by (priority, due time) and dispatched under a global concurrency cap;
+    a device is never scanned twice at once nor more often than its schedule's min_interval.
+    """
+
+    def __init__(self, run_scan, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 state_file: str = STATE_FILE, tick: float = TICK, active=None):
+        self.run_scan = run_scan
+        # Optional callable checked every tick, due scans wait while it returns False
+        self.active = active
+        self.max_concurrent = max_concurrent
+        self.state_file = state_file
+        self.tick = tick
+        self.schedules = {}
+        self.device_last_run = {}
+        self.results = {}
+        self._queue = []
+        self._queued = set()
+        self._running = set()
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._load_state()
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] Failed to load schedule state: {e}")
+            return
+
+        self.device_last_run = state.get("device_last_run", {})
+        for schedule_id, data in state.get("schedules", {}).items():
+            schedule = ScanSchedule(
+                schedule_id, data["ips"], data["interval"], data.get("jitter", 0),
+                data.get("priority", "normal"), data.get("min_interval", DEFAULT_MIN_INTERVAL),
+                next_run=data.get("next_run"), base_run=data.get("base_run")
+            )
+            schedule.last_run = data.get("last_run")
+            schedule.missed_runs = data.get("missed_runs", 0)
+            self.schedules[schedule_id] = schedule
+        print(f"[+] Restored {len(self.schedules)} scan schedules (credentials must be supplied again)")
+
+    def _save_state(self):
+        state = {
+            "schedules": {schedule_id: s.to_state() for schedule_id, s in self.schedules.items()},
+            "device_last_run": self.device_last_run,
+        }
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def add(self, schedule: ScanSchedule):
+        with self._lock:
+            previous = self.schedules.get(schedule.id)
+            if previous:
+                # Re-registering keeps the timing state, so a restart does not trigger a burst of scans
+                schedule.next_run = previous.next_run
+                schedule.base_run = previous.base_run
+                schedule.last_run = previous.last_run
+                schedule.missed_runs = previous.missed_runs
+            self.schedules[schedule.id] = schedule
+            self._save_state()
+        return schedule
+
+    def remove(self, schedule_id: str):
+        with self._lock:
+            schedule = self.schedules.pop(schedule_id, None)
+            if schedule:
+                self._save_state()
+        return schedule
+
+    def status(self, schedule_id: str = None):
+        with self._lock:
+            schedules = [self.schedules[schedule_id]] if schedule_id else list(self.schedules.values())
+            return [
+                {
+                    **s.to_dict(),
+                    "devices": {
+                        ip: {
+                            "last_run": _isoformat(self.device_last_run.get(ip)),
+                            "queued": (s.id, ip) in self._queued,
+                            "running": ip in self._running,
+                            "last_result": self.results.get(ip),
+                        }
+                        for ip in s.ips
+                    },
+                }
+                for s in schedules
+            ]
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"[+] Scan scheduler started (max {self.max_concurrent} concurrent scans)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=self.tick * 2)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                if self.active is None or self.active():
+                    self.run_pending()
+            except Exception as e:
+                print(f"[!] Scheduler error: {e}")
+            self._stopped.wait(self.tick)
+
+    def run_pending(self, now: float = None):
+        """Queue every due device scan and start as many as the concurrency cap allows."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for schedule in self.schedules.values():
+                if schedule.credentials is None or schedule.next_run > now:
+                    continue
+                for ip in schedule.ips:
+                    key = (schedule.id, ip)
+                    # A device that is still queued from an earlier slot absorbs this one
+                    if key not in self._queued:
+                        self._queued.add(key)
+                        self._counter += 1
+                        heapq.heappush(self._queue, (PRIORITIES[schedule.priority], schedule.next_run, self._counter, key))
+                schedule.reschedule(now)
+
+            deferred = []
+            started = []
+            while self._queue and len(self._running) < self.max_concurrent:
+                entry = heapq.heappop(self._queue)
+                schedule_id, ip = entry[3]
+                schedule = self.schedules.get(schedule_id)
+                if schedule is None or ip not in schedule.ips:
+                    self._queued.discard(entry[3])
+                    continue
+
+                last_run = self.device_last_run.get(ip)
+                if ip in self._running or (last_run and now - last_run < schedule.min_interval):
+                    deferred.append(entry)
+                    continue
+
+                self._queued.discard(entry[3])
+                self._running.add(ip)
+                self.device_last_run[ip] = now
+                schedule.last_run = now
+                started.append((schedule, ip))
+
+            for entry in deferred:
+                heapq.heappush(self._queue, entry)
+            if started:
+                self._save_state()
+
+        for schedule, ip in started:
+            threading.Thread(target=self._run_device, args=(schedule, ip), daemon=True).start()
+        return started
+
+    def _run_device(self, schedule: ScanSchedule, ip: str):
+        print(f"[+] Scheduled scan '{schedule.id}' starting for {ip}")
+        started_at = time.time()
+        try:
+            results = self.run_scan(ip, schedule.credentials)
+            outcome = {"status": "OK", "results": results}
+        except Exception as e:
+            print(f"[!] Scheduled scan '{schedule.id}' failed for {ip}: {e}")
+            outcome = {"status": "error", "error": str(e)}
+
+        outcome["started_at"] = _isoformat(started_at)
+        outcome["finished_at"] = _isoformat(time.time())
+        with self._lock:
+            self.results[ip] = outcome
+            self._running.discard(ip)
@@ -0,0 +1,88 @@
+import ipaddress
+import re
+
+BASE_FILTER = "tcp"
+# BPF expressions only need these characters; anything else (quotes, $, ;, backticks) could escape
+# the single quotes the filter is wrapped in on the remote shell
+_SAFE_FILTER = re.compile(r"^[A-Za-z0-9 _.:/()!&|<>=\[\]*+-]*$")
+
+
+def validate_filter(expression: str) -> str:
+    expression = (expression or "").strip()
+    if not _SAFE_FILTER.match(expression):
+        raise ValueError(f"Capture filter contains unsupported characters: {expression}")
+    return expression
+
+
+def session_filter(endpoints) -> str:
+    """BPF expression matching the connector's own SSH session: (client_ip, client_port, server_ip, server_port)."""
+    client_ip, client_port, server_ip, server_port = endpoints
+    return f"host {client_ip} and host {server_ip} and port {client_port} and port {server_port}"
+
+
+def build_capture_filter(base: str = BASE_FILTER, session=None, include: str = None, exclude: str = None) -> str:
+    """
+    Combine the base protocol filter with the session exclusion and the user's include/exclude
+    expressions, so unwanted packets are dropped in the kernel before tshark ever sees them.
+    """
+    parts = [base]
+    if session:
+        parts.append(f"not ({session_filter(session)})")
+    include = validate_filter(include)
+    if include:
+        parts.append(f"({include})")
+    exclude = validate_filter(exclude)
+    if exclude:
+        parts.append(f"not ({exclude})")
+    return " and ".join(parts)
+
+
+def capture_filter_for(connector, include: str = None, exclude: str = None, exclude_session: bool = True) -> str:
+    """Capture filter for scans over `connector`; every channel shares one transport, so one session covers them all."""
+    session = None
+    if exclude_session:
+        try:
+            session = connector.session_endpoints()
+        except Exception as e:
+            print(f"[!] Could not determine the SSH session endpoints, own traffic stays in the capture: {e}")
+    capture_filter = build_capture_filter(session=session, include=include, exclude=exclude)
+    print(f"[+] Capture filter: {capture_filter}")
+    return capture_filter
+
+
+def _networks(targets):
+    networks = []
+    for target in targets:
+        try:
+            networks.append(ipaddress.ip_network(target, strict=False))
+        except ValueError:
+            continue  # A hostname target cannot be matched against flow addresses
+    return networks
+
+
+def drop_own_scan(conversations, scanner_ips, targets):
+    """
+    Conversations minus the probes of the scan's own nmap stages, which run while the capture does:
+    every flow between one of `scanner_ips` (the audited device as the connector reaches it) and the
+    `targets` networks. Otherwise the device's own scan is reported as a port scan by that device.
+    """
+    scanners = {ip for ip in scanner_ips if ip}
+    networks = _networks(targets)
+    if not scanners or not networks:
+        return conversations
+
+    def is_target(ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in network for network in networks)
+
+    kept = []
+    for conv in conversations:
+        source = conv["source"].rpartition(":")[0]
+        destination = conv["destination"].rpartition(":")[0]
+        if (source in scanners and is_target(destination)) or (destination in scanners and is_target(source)):
+            continue
+        kept.append(conv)
+    return kept
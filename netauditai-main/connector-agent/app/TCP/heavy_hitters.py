@@ -0,0 +1,76 @@
+TOP_K = 20
+SKETCH_FACTOR = 4  # sketch capacity relative to K, the error bound shrinks as it grows
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving sketch (Metwally et al.): tracks at most `capacity` items.
+    Every reported count overestimates the true count by at most its `error`, and
+    error <= total / capacity, so any item heavier than that is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters = {}
+        self.total = 0
+
+    def add(self, item, weight=1):
+        self.total += weight
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Evict the smallest counter; the newcomer inherits its count as possible overestimation
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def top(self, k: int):
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)
+        threshold = ranked[k][1][0] if len(ranked) > k else 0
+        return [
+            {
+                "item": item,
+                "count": count,
+                "error": error,
+                # The lower bound beats every item outside the top-K, so the rank is certain
+                "guaranteed": count - error >= threshold,
+            }
+            for item, (count, error) in ranked[:k]
+        ]
+
+
+def _talker(endpoint: str):
+    return endpoint.rpartition(":")[0] or endpoint
+
+
+def summarize_heavy_hitters(conversations, k: int = TOP_K):
+    """Top-K talker IPs by bytes, packets and flow count, plus the remainder folded into one bucket each."""
+    capacity = k * SKETCH_FACTOR
+    by_bytes = SpaceSaving(capacity)
+    by_packets = SpaceSaving(capacity)
+    by_flows = SpaceSaving(capacity)
+
+    for conv in conversations:
+        talker = _talker(conv["source"])
+        by_bytes.add(talker, conv["total_bytes"])
+        by_packets.add(talker, conv["total_frames"])
+        by_flows.add(talker, 1)
+
+    summary = {"k": k, "sketch_capacity": capacity}
+    for name, sketch in (("bytes", by_bytes), ("packets", by_packets), ("flows", by_flows)):
+        top = sketch.top(k)
+        summary[f"top_by_{name}"] = [
+            {"talker": entry["item"], name: entry["count"], "error": entry["error"], "guaranteed": entry["guaranteed"]}
+            for entry in top
+        ]
+        summary[f"other_{name}"] = max(0, sketch.total - sum(entry["count"] for entry in top))
+        summary[f"total_{name}"] = sketch.total
+    summary["max_error"] = {
+        "bytes": by_bytes.total // capacity,
+        "packets": by_packets.total // capacity,
+        "flows": by_flows.total // capacity,
+    }
+    return summary
@@ -1,8 +1,14 @@
 import subprocess
+import heapq
 import json
 import re
 from datetime import datetime
 
+from .heavy_hitters import summarize_heavy_hitters
+
+TOP_SOURCES = 20
+TOP_CONVERSATIONS = 10
+
 def capture_performance(interface, duration=10):
     print(f"[+] Capturing performance data on {interface} for {duration} seconds...")
 
@@ -54,28 +60,60 @@ def parse_performance_data(input_text):
 
     return conversations
 
-def assess_performance(conversations):
+def assess_performance(conversations, top_sources=TOP_SOURCES, top_conversations=TOP_CONVERSATIONS):
     assessment = {}
 
-    for conv in conversations:
+    for index, conv in enumerate(conversations):
         src_ip = conv["source"]
         if src_ip not in assessment:
             assessment[src_ip] = {
                 'total_packets': 0,
                 'total_bytes': 0,
                 'total_duration': 0,
-                'conversations': []
+                'conversations': [],
+                'folded_conversations': 0
             }
 
         assessment[src_ip]['total_packets'] += conv['total_frames']
         assessment[src_ip]['total_bytes'] += conv['total_bytes']
         assessment[src_ip]['total_duration'] += conv['duration']
-        assessment[src_ip]['conversations'].append({
+
+        # Only the heaviest conversations per source are kept, the rest are just counted
+        kept = assessment[src_ip]['conversations']
+        entry = (conv['total_bytes'], index, {
             'destination': conv['destination'],
             'total_frames': conv['total_frames'],
             'total_bytes': conv['total_bytes'],
             'duration': conv['duration']
         })
+        if len(kept) < top_conversations:
+            heapq.heappush(kept, entry)
+        else:
+            heapq.heappushpop(kept, entry)
+            assessment[src_ip]['folded_conversations'] += 1
+
+    for data in assessment.values():
+        data['conversations'] = [conv for _, _, conv in sorted(data['conversations'], reverse=True)]
+
+    # Fold every source outside the top talkers into a single "other" bucket
+    if len(assessment) > top_sources:
+        ranked = sorted(assessment, key=lambda src: assessment[src]['total_bytes'], reverse=True)
+        other = {
+            'total_packets': 0,
+            'total_bytes': 0,
+            'total_duration': 0,
+            'conversations': [],
+            'folded_conversations': 0,
+            'folded_sources': 0
+        }
+        for src_ip in ranked[top_sources:]:
+            data = assessment.pop(src_ip)
+            other['total_packets'] += data['total_packets']
+            other['total_bytes'] += data['total_bytes']
+            other['total_duration'] += data['total_duration']
+            other['folded_conversations'] += len(data['conversations']) + data['folded_conversations']
+            other['folded_sources'] += 1
+        assessment['other'] = other
 
     # Calculate average throughput for each source IP
     for src_ip, data in assessment.items():
@@ -92,7 +130,14 @@ def assess_performance(conversations):
     print("[+] Performance Assessment:")
     print(assessment_json)
 
-    return assessment_json
+    return assessment
+
+def assess_interface(interface, conversations):
+    return {
+        "interface": interface,
+        "assessment": assess_performance(conversations),
+        "heavy_hitters": summarize_heavy_hitters(conversations)
+    }
 
 def extract_interface_names(output):
     # Split the output into lines
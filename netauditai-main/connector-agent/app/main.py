@@ -1,11 +1,32 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from ssh_connector import SSHConnector
+from concurrent.futures import ThreadPoolExecutor, wait
+import fcntl
+import os
+import tempfile
+from ssh_connector import SSHConnector, ChannelDeadlineExceeded
 from pydantic import BaseModel
+from models import ScanResults, ScanResponse
+from response_encoding import encoded_response
+from scan_budget import ScanBudget, MIN_BUDGET, MIN_PROBE_TIME
+from worker_registry import register_worker, unregister_worker, worker_count
 
 from NMAP.nmap_scan import *
+from NMAP.fingerprint_cache import *
 from TCP.tcp_scan import *
+from TCP.capture_filter import *
 from IP.check_ips import *
+from IP.ip_blacklist_checker import get_blocklist_index
+from IP.ip_enrichment import enrich_ips, get_enricher
+from MONITOR.flow_monitor import *
+from SCHEDULER.scan_scheduler import *
+from COLLECTOR.collector_deploy import *
+from QUEUE.scan_queue import *
+from QUEUE.scan_worker import *
+from EXPORT.columnar_store import *
+
+NMAP_DEADLINE = 900
+CAPTURE_DEADLINE_MARGIN = 30
 
 app = FastAPI()
 
@@ -18,102 +39,567 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def announce_worker():
+    # Registered first, so the startup hooks below already see this worker in worker_count()
+    register_worker()
+
+
+@app.on_event("shutdown")
+async def retire_worker():
+    unregister_worker()
+
+
 class ScanRequest(BaseModel):
     method: str
     ip: str
     username: str
     private_key: str
     sudo_pwd: str
+    force_refresh: bool = False
+    use_collector: bool = False
+    budget: float | None = None  # seconds the whole scan may take, unbounded when omitted
+    capture_include: str | None = None  # BPF expression packets must also match
+    capture_exclude: str | None = None  # BPF expression for packets to drop
+    exclude_own_session: bool = True
+
+
+class MonitorRequest(ScanRequest):
+    interfaces: list[str] | None = None
+
+
+class ScheduleRequest(BaseModel):
+    id: str
+    ips: list[str]
+    interval: int
+    jitter: int = 0
+    priority: str = "normal"
+    min_interval: int = DEFAULT_MIN_INTERVAL
+    method: str
+    username: str
+    private_key: str
+    sudo_pwd: str
+
+
+monitors: dict[str, FlowMonitor] = {}
+
+
+def single_process() -> bool:
+    # Monitors and schedules (credentials included) live in the memory of one process,
+    # so with several workers a request could land on a worker that does not know them
+    return worker_count() <= 1
+
+
+def require_single_process(feature: str):
+    if not single_process():
+        raise HTTPException(
+            status_code=503,
+            detail=f"{feature} need a single-process connector, run it with one worker (WEB_CONCURRENCY=1)"
+        )
 
 
 class Response(BaseModel):
     network_details: str
     packet_tracer: str
 
-@app.post("/scan")
-async def scan_device(req: ScanRequest):
+def check_scan_request(req: ScanRequest):
     if req.method != "ssh":
         raise HTTPException(status_code=400, detail=f"Unsupported method: {req.method}")
+    if req.budget is not None and req.budget < MIN_BUDGET:
+        raise HTTPException(status_code=400, detail=f"Scan budget must be at least {MIN_BUDGET}s")
+    try:
+        validate_filter(req.capture_include)
+        validate_filter(req.capture_exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def traced_ips(tracer_result: dict):
+    """Addresses named by the packet tracer keys: "ip", "ip port-scan" or "src -> dst:port beacon"."""
+    ips = set()
+    for key in tracer_result if "error" not in tracer_result else []:
+        parts = key.split()
+        ips.add(parts[0])
+        if len(parts) > 2 and parts[1] == "->":
+            ips.add(parts[2].rpartition(":")[0])
+    return ips
+
+
+def run_scan(req: ScanRequest) -> ScanResults:
+    combined_results = {
+        "performance_assessment": [],
+        "network_scan_result": {},
+        "packet_tracer_result": {}
+    }
 
+    connector = SSHConnector(
+        ip=req.ip,
+        username=req.username,
+        private_key=req.private_key,
+        sudo_password=req.sudo_pwd
+    )
+    connector.connect()
+    if not connector.sudo_password:
+        raise Exception("Sudo password required for sudo session")
+
+    budget = ScanBudget(req.budget)
+    interfaces = extract_interface_names(connector.execute_on_channel("ip link show", deadline=budget.remaining()))
+    capture_filter = capture_filter_for(
+        connector, req.capture_include, req.capture_exclude, exclude_session=req.exclude_own_session
+    )
+
+    # The nmap stages probe these targets from the device while it captures; those flows are left out
+    scan_targets = [f"{req.ip.rsplit('.', 1)[0]}.0/24"]
+    scanner_ips = {req.ip}
     try:
-        combined_results = {
-            "performance_assessment": {},
-            "network_scan_result": {},
-            "packet_tracer_result": {}
+        scanner_ips.add(connector.session_endpoints()[2])
+    except Exception as e:
+        print(f"[!] Could not determine the device address of the SSH session: {e}")
+
+    def nmap_runner(stage):
+        def run_sudo(command):
+            try:
+                return connector.execute_on_channel(
+                    command, use_sudo=True, deadline=budget.deadline(stage, NMAP_DEADLINE)
+                )
+            except ChannelDeadlineExceeded as e:
+                # nmap prints each host as it finishes, so what came back so far is still usable
+                print(f"[!] {e}")
+                budget.record(stage, "partial")
+                return e.output
+        return run_sudo
+
+    def nmap_stage(stage, target):
+        return fingerprint_scan(
+            nmap_runner(stage),
+            target,
+            force_refresh=req.force_refresh,
+            timing=budget.nmap_timing(stage),
+            discovery_options=budget.discovery_options(stage),
+            time_left=lambda: budget.deadline(stage, NMAP_DEADLINE),
+            min_probe_time=MIN_PROBE_TIME if budget.limited else 0
+        )
+
+    def network_scan_stage():
+        return nmap_stage("network", req.ip)
+
+    def subnet_scan_stage():
+        sub_net_ip = req.ip.rsplit('.', 1)[0] + ".*"
+        scan_results = nmap_stage("subnet", sub_net_ip)
+        save_to_json(scan_results, "nmap_scan_results.json")
+
+    def capture_stage():
+        # One tshark per interface feeds both the performance and the packet tracer results
+        load_blacklist(force_update=budget.refresh_blacklist())
+        # Sized after the blacklist refresh, so the capture only gets the time that is really left
+        duration = budget.capture_duration()
+        outputs = connector.execute_multiplexed(
+            {
+                interface: f"tshark -i {interface} -f '{capture_filter}' -q -z conv,tcp, -a duration:{duration}"
+                for interface in interfaces
+            },
+            use_sudo=True,
+            deadline=budget.deadline("capture", duration + CAPTURE_DEADLINE_MARGIN)
+        )
+        conversations = {
+            interface: drop_own_scan(parse_performance_data(output), scanner_ips, scan_targets)
+            for interface, output in outputs.items()
         }
+        assessments = [
+            assess_interface(interface, interface_conversations)
+            for interface, interface_conversations in conversations.items()
+        ]
+        return assessments, trace_capture_outputs(outputs, conversations), conversations
 
-        connector = SSHConnector(
-            ip=req.ip,
-            username=req.username,
-            private_key=req.private_key,
-            sudo_password=req.sudo_pwd
+    def collector_stage():
+        # One on-device capture feeds both the performance and the packet tracer results
+        duration = budget.capture_duration()
+        summary = run_collector(
+            connector, interfaces, duration,
+            deadline=budget.deadline("capture", duration + COLLECTOR_DEADLINE_MARGIN),
+            capture_filter=capture_filter
         )
-        connector.start_sudo_session()
-        interfaces = extract_interface_names(connector.execute_in_sudo_session("ip link show"))
-        duration = 10
-        assessments = []
-
-        nmap_output = connector.execute_in_sudo_session(f"nmap -sV -O -T5 {req.ip}")
-        if nmap_output:
-            network_scan_result = parse_nmap_output(nmap_output)
+        conversations = {
+            interface: drop_own_scan(interface_conversations, scanner_ips, scan_targets)
+            for interface, interface_conversations in summary_conversations(summary).items()
+        }
+        assessments = [
+            assess_interface(interface, conversations.get(interface, []))
+            for interface in interfaces
+        ]
+        load_blacklist(force_update=budget.refresh_blacklist())
+        ip_results = classify_ips(summary["ips"])
+        ip_results.update(detect_anomalies(
+            [conv for interface_conversations in conversations.values() for conv in interface_conversations]
+        ))
+        return assessments, ip_results, conversations
+
+    # The stages use independent channels of the same transport, so the scan takes as long as the slowest one
+    stages = {
+        "network": network_scan_stage,
+        "subnet": subnet_scan_stage,
+    }
+    if req.use_collector:
+        stages["collector"] = collector_stage
+    else:
+        stages["capture"] = capture_stage
+
+    pool = ThreadPoolExecutor(max_workers=len(stages))
+    futures = {name: pool.submit(budget.run_stage(name, stage)) for name, stage in stages.items()}
+
+    # Stages still running at the deadline are dropped; closing the connector below ends their channels
+    _, overran = wait(futures.values(), timeout=budget.remaining())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for name, future in futures.items():
+        if future in overran:
+            print(f"[!] Stage {name} exceeded the scan budget")
+            budget.record(name, "timed_out")
+
+    def stage_result(name):
+        stage = name
+        if name in ("performance", "packet_tracer", "flows"):
+            stage = "collector" if req.use_collector else "capture"
+        if futures[stage] in overran:
+            raise Exception(f"Stage {stage} exceeded the {req.budget}s scan budget")
+        result = futures[stage].result()
+        if stage in ("collector", "capture"):
+            # The conversations before assess_performance trims them, for the columnar store
+            assessments, ip_results, conversations = result
+            return {"performance": assessments, "packet_tracer": ip_results, "flows": conversations}[name]
+        return result
+
+    try:
+        network_scan_result = stage_result("network")
+        if network_scan_result["hosts"]:
             combined_results["network_scan_result"] = network_scan_result
             print("Network scan completed successfully")
         else:
             print("No nmap output received")
             combined_results["network_scan_result"] = {"error": "No nmap output received"}
+    except Exception as e:
+        if futures["network"] not in overran:
+            connector.close()
+            raise
+        combined_results["network_scan_result"] = {"error": str(e)}
 
-        try:
-            sub_net_ip = req.ip.rsplit('.', 1)[0] + ".*"
-            output = connector.execute_in_sudo_session(f"nmap -sV -O -T5 {sub_net_ip}")
-            generate_serialized_network_report_from_string(output)
-            print("Local network report generated")
-        except Exception as e:
-            print(f"Error generating local network report: {e}")
+    try:
+        if futures["subnet"] in overran:
+            raise Exception(f"Stage subnet exceeded the {req.budget}s scan budget")
+        futures["subnet"].result()
+        print("Local network report generated")
+    except Exception as e:
+        print(f"Error generating local network report: {e}")
+
+    try:
+        assessments = stage_result("performance")
+        if assessments:
+            combined_results["performance_assessment"] = assessments
+        else:
+            combined_results["performance_assessment"] = {"error": "No TCP conversations captured"}
+        print("TCP performance assessment completed")
+    except Exception as e:
+        print(f"Error in TCP performance assessment: {e}")
+        combined_results["performance_assessment"] = {"error": str(e)}
 
+    try:
+        result = stage_result("packet_tracer")
+        print(result)
+
+        combined_results["packet_tracer_result"] = result
+        print("Packet tracer analysis completed")
+    except Exception as e:
+        print(f"Error in packet tracer analysis: {e}")
+        combined_results["packet_tracer_result"] = {"error": str(e)}
+
+    try:
+        combined_results["ip_enrichment"] = enrich_ips(traced_ips(combined_results["packet_tracer_result"]))
+    except Exception as e:
+        print(f"[!] IP enrichment failed: {e}")
+
+    connector.close()
+
+    results = ScanResults(**combined_results, budget=budget.report())
+    if store_enabled():
         try:
-            for interface in interfaces:
-                output = connector.execute_with_pty(
-                    f"tshark -i {interface} -q -z conv,tcp, -a duration:{duration}",
-                    use_sudo=True
-                )
-                # print(output)
-
-                conversations = parse_performance_data(output)
-                assessment = assess_performance(conversations)
-                assessments.append({
-                    "interface": interface,
-                    "assessment": assessment
-                })
-
-            if assessments:
-                combined_results["performance_assessment"] = assessments
-            else:
-                combined_results["performance_assessment"] = {"error": "No TCP conversations captured"}
-            print("TCP performance assessment completed")
+            try:
+                conversations = stage_result("flows")
+            except Exception:
+                conversations = None
+            export_scan(req.ip, results.model_dump(), conversations=conversations)
         except Exception as e:
-            print(f"Error in TCP performance assessment: {e}")
-            combined_results["performance_assessment"] = {"error": str(e)}
+            print(f"[!] Failed to export scan of {req.ip} to the columnar store: {e}")
 
-        try:
-            result = scan_packet_capture_from_string(interfaces, connector)
-            print(result)
+    return results
 
-            serialized_results = serialize_analysis_results(result)
-            print(serialized_results)
 
-            combined_results["packet_tracer_result"] = serialized_results
-            print("Packet tracer analysis completed")
-        except Exception as e:
-            print(f"Error in packet tracer analysis: {e}")
-            combined_results["packet_tracer_result"] = {"error": str(e)}
+@app.post("/scan", response_model=ScanResponse)
+async def scan_device(req: ScanRequest, request: Request):
+    check_scan_request(req)
 
-        connector.close()
+    try:
+        combined_results = run_scan(req)
 
-        return {
-            "status": "OK",
-            "results": combined_results
-        }
+        return encoded_response(ScanResponse(status="OK", results=combined_results), request)
 
     except Exception as e:
         print(f"Error during scan: {e}")
         raise HTTPException(status_code=500, detail=f"Scan failed: {str(e)}")
+
+
+@app.post("/monitor")
+async def start_monitor(req: MonitorRequest):
+    require_single_process("Monitors")
+    check_scan_request(req)
+
+    monitor = monitors.get(req.ip)
+    if monitor and monitor.running:
+        return {"status": "OK", "results": monitor.stats(history=0)}
+    if monitor:
+        # Its capture died (device rebooted, link dropped), release the SSH connection before replacing it
+        monitors.pop(req.ip)
+        monitor.stop()
+
+    try:
+        connector = SSHConnector(
+            ip=req.ip,
+            username=req.username,
+            private_key=req.private_key,
+            sudo_password=req.sudo_pwd
+        )
+        connector.connect()
+        interfaces = req.interfaces or extract_interface_names(connector.execute("ip link show"))
+        capture_filter = capture_filter_for(
+            connector, req.capture_include, req.capture_exclude, exclude_session=req.exclude_own_session
+        )
+
+        monitor = FlowMonitor(connector, interfaces, capture_filter=capture_filter)
+        monitor.start()
+        monitors[req.ip] = monitor
+
+        return {"status": "OK", "results": monitor.stats(history=0)}
+
+    except Exception as e:
+        print(f"Error starting monitor: {e}")
+        raise HTTPException(status_code=500, detail=f"Monitor failed: {str(e)}")
+
+
+@app.get("/monitor/{ip}")
+async def get_monitor_stats(ip: str, window: int | None = None, history: int | None = None):
+    require_single_process("Monitors")
+    monitor = monitors.get(ip)
+    if not monitor:
+        raise HTTPException(status_code=404, detail=f"No monitor running for {ip}")
+    if window is not None and window not in monitor.windows:
+        raise HTTPException(status_code=400, detail=f"Unsupported window: {window}")
+
+    return {"status": "OK", "results": monitor.stats(window=window, history=history)}
+
+
+@app.delete("/monitor/{ip}")
+async def stop_monitor(ip: str):
+    require_single_process("Monitors")
+    monitor = monitors.pop(ip, None)
+    if not monitor:
+        raise HTTPException(status_code=404, detail=f"No monitor running for {ip}")
+
+    monitor.stop()
+    return {"status": "OK", "results": monitor.stats(history=0)}
+
+
+@app.on_event("startup")
+async def warm_blocklist():
+    # Every worker maps the shared index before it accepts requests; only the first one builds it
+    try:
+        load_blacklist()
+    except Exception as e:
+        print(f"[!] Blocklist warm-up failed: {e}")
+
+    # Loading the offline ASN / country tables takes seconds, so it is done before the first scan
+    enricher = get_enricher()
+    if enricher.available:
+        print(f"[+] IP enrichment loaded from {len(enricher.tables) + len(enricher.mmdb_readers)} dataset(s)")
+
+
+@app.get("/ready")
+async def readiness():
+    index = get_blocklist_index()
+    if not index.ready:
+        raise HTTPException(status_code=503, detail="Blocklist index not loaded yet")
+
+    return {"status": "OK", "results": {"pid": os.getpid(), "blocklist_ranges": len(index), "built_at": index.built_at}}
+
+
+def run_scheduled_scan(ip: str, credentials: dict) -> ScanResults:
+    return run_scan(ScanRequest(ip=ip, **credentials))
+
+
+# Checked every tick as well, a sibling worker forked after startup pauses the scheduler
+scheduler = ScanScheduler(run_scheduled_scan, active=single_process)
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    if not single_process():
+        # Each worker would run its own copy and overwrite the others' schedules in the state file
+        print(f"[!] Scan scheduler disabled: {worker_count()} worker processes")
+        return
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    scheduler.stop()
+
+
+@app.post("/schedules")
+async def create_schedule(req: ScheduleRequest):
+    require_single_process("Schedules")
+    if req.method != "ssh":
+        raise HTTPException(status_code=400, detail=f"Unsupported method: {req.method}")
+
+    try:
+        schedule = ScanSchedule(
+            req.id,
+            req.ips,
+            req.interval,
+            jitter=req.jitter,
+            priority=req.priority,
+            min_interval=req.min_interval,
+            credentials={
+                "method": req.method,
+                "username": req.username,
+                "private_key": req.private_key,
+                "sudo_pwd": req.sudo_pwd
+            }
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    scheduler.add(schedule)
+    return {"status": "OK", "results": schedule.to_dict()}
+
+
+@app.get("/schedules")
+async def list_schedules():
+    require_single_process("Schedules")
+    return {"status": "OK", "results": scheduler.status()}
+
+
+@app.get("/schedules/{schedule_id}")
+async def get_schedule(schedule_id: str):
+    require_single_process("Schedules")
+    if schedule_id not in scheduler.schedules:
+        raise HTTPException(status_code=404, detail=f"Unknown schedule: {schedule_id}")
+
+    return {"status": "OK", "results": scheduler.status(schedule_id)[0]}
+
+
+@app.delete("/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: str):
+    require_single_process("Schedules")
+    schedule = scheduler.remove(schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail=f"Unknown schedule: {schedule_id}")
+
+    return {"status": "OK", "results": schedule.to_dict()}
+
+
+scan_queue = None
+scan_workers: list[ScanWorker] = []
+
+
+def get_scan_queue():
+    global scan_queue
+    if scan_queue is None:
+        scan_queue = open_scan_queue()
+    return scan_queue
+
+
+def require_scan_queue():
+    try:
+        return get_scan_queue()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Scan queue unavailable: {str(e)}")
+
+
+_consumer_lock = None
+
+
+def claim_consumer_role() -> bool:
+    """True in the one process of a prefork replica that holds the consumer lock until it exits."""
+    global _consumer_lock
+    lock_file = open(os.path.join(tempfile.gettempdir(), f"netaudit-consumers-{os.getppid()}.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _consumer_lock = lock_file
+    return True
+
+
+def run_queued_scan(payload: dict) -> str:
+    return run_scan(ScanRequest(**payload)).model_dump_json()
+
+
+@app.on_event("startup")
+async def start_scan_workers():
+    # SCAN_WORKERS > 0 turns this replica into a queue consumer as well as an API server.
+    # Job state lives in the queue, but only one worker process of a replica consumes it
+    if int(os.getenv("SCAN_WORKERS", "0")) > 0 and not claim_consumer_role():
+        print("[INFO] Queue consumers run in another worker process of this replica")
+        return
+    for _ in range(int(os.getenv("SCAN_WORKERS", "0"))):
+        worker = ScanWorker(
+            get_scan_queue(),
+            run_queued_scan,
+            visibility_timeout=float(os.getenv("SCAN_VISIBILITY_TIMEOUT", DEFAULT_VISIBILITY_TIMEOUT))
+        )
+        worker.start()
+        scan_workers.append(worker)
+
+
+@app.on_event("shutdown")
+async def stop_scan_workers():
+    for worker in scan_workers:
+        worker.stop()
+
+
+@app.post("/jobs")
+async def enqueue_scan(req: ScanRequest):
+    check_scan_request(req)
+
+    job_id = require_scan_queue().enqueue(req.model_dump())
+    return {"status": "OK", "results": {"id": job_id}}
+
+
+@app.get("/jobs/{job_id}")
+async def get_scan_job(job_id: str):
+    job = require_scan_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    return {"status": "OK", "results": job}
+
+
+@app.get("/store/{table}")
+async def query_store(table: str, device: str | None = None, since: str | None = None, until: str | None = None,
+                      columns: str | None = None, limit: int = 1000):
+    if table not in TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+    if not store_enabled():
+        raise HTTPException(status_code=400, detail=f"Columnar store disabled, set {SCAN_STORE_DIR_ENV} and install pyarrow")
+
+    try:
+        rows = query(
+            table,
+            columns=columns.split(",") if columns else None,
+            devices=[device] if device else None,
+            since=since,
+            until=until,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Query failed: {str(e)}")
+
+    return {"status": "OK", "results": rows.to_pylist()}
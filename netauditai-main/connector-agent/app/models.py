@@ -0,0 +1,102 @@
+from pydantic import BaseModel
+
+
+class ErrorResult(BaseModel):
+    error: str
+
+
+class NmapPort(BaseModel):
+    portid: str
+    state: str
+    service: str
+    version: str = ""
+    cached: bool = False
+
+
+class NmapHost(BaseModel):
+    address: str | None = None
+    ports: list[NmapPort] = []
+    os: str | None = None
+
+
+class NetworkScanResult(BaseModel):
+    hosts: list[NmapHost] = []
+
+
+class ConversationSummary(BaseModel):
+    destination: str
+    total_frames: int
+    total_bytes: int
+    duration: float
+
+
+class SourceAssessment(BaseModel):
+    total_packets: int
+    total_bytes: int
+    total_duration: float
+    average_throughput: float
+    conversations: list[ConversationSummary] = []
+    folded_conversations: int = 0
+    folded_sources: int = 0
+
+
+class HeavyHitter(BaseModel):
+    talker: str
+    bytes: int | None = None
+    packets: int | None = None
+    flows: int | None = None
+    error: int
+    guaranteed: bool
+
+
+class HeavyHitterSummary(BaseModel):
+    k: int
+    sketch_capacity: int
+    top_by_bytes: list[HeavyHitter] = []
+    top_by_packets: list[HeavyHitter] = []
+    top_by_flows: list[HeavyHitter] = []
+    other_bytes: int = 0
+    other_packets: int = 0
+    other_flows: int = 0
+    total_bytes: int = 0
+    total_packets: int = 0
+    total_flows: int = 0
+    max_error: dict[str, int] = {}
+
+
+class InterfaceAssessment(BaseModel):
+    interface: str
+    assessment: dict[str, SourceAssessment] = {}
+    heavy_hitters: HeavyHitterSummary | None = None
+
+
+class StageReport(BaseModel):
+    status: str
+    allotted: float | None = None
+    elapsed: float | None = None
+
+
+class ScanBudgetReport(BaseModel):
+    total: float
+    elapsed: float
+    stages: dict[str, StageReport] = {}
+
+
+class IPEnrichment(BaseModel):
+    asn: int | None = None
+    as_org: str | None = None
+    country: str | None = None
+    prefix: str | None = None
+
+
+class ScanResults(BaseModel):
+    performance_assessment: list[InterfaceAssessment] | ErrorResult = []
+    network_scan_result: NetworkScanResult | ErrorResult = NetworkScanResult()
+    packet_tracer_result: dict[str, str] | ErrorResult = {}
+    ip_enrichment: dict[str, IPEnrichment] = {}
+    budget: ScanBudgetReport | None = None
+
+
+class ScanResponse(BaseModel):
+    status: str
+    results: ScanResults
@@ -0,0 +1,71 @@
+import gzip
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+MIN_COMPRESS_SIZE = 1024  # small payloads are not worth the compression round trip
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _accepts(header: str, token: str):
+    return any(part.split(";")[0].strip() == token for part in header.split(","))
+
+
+def negotiate_media_type(accept: str):
+    if msgpack is not None:
+        for media_type in MSGPACK_TYPES:
+            if _accepts(accept, media_type):
+                return media_type
+    return "application/json"
+
+
+def negotiate_encoding(accept_encoding: str):
+    if zstandard is not None and _accepts(accept_encoding, "zstd"):
+        return "zstd"
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def encode_body(model: BaseModel, media_type: str = "application/json") -> bytes:
+    """Serialize a model exactly once, as compact JSON or MessagePack."""
+    if media_type in MSGPACK_TYPES:
+        return msgpack.packb(model.model_dump(mode="json"))
+    return model.model_dump_json().encode()
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def encoded_response(model: BaseModel, request: Request) -> Response:
+    """
+    Build a response for `model` honouring the request's Accept and Accept-Encoding headers.
+    JSON stays the default so existing clients are unaffected.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept", ""))
+    body = encode_body(model, media_type)
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding and len(body) >= MIN_COMPRESS_SIZE:
+        body = compress_body(body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,122 @@
+import threading
+import time
+
+DEFAULT_CAPTURE_DURATION = 10
+MIN_CAPTURE_DURATION = 2
+CAPTURE_OVERHEAD = 5  # tshark start-up plus printing the conversation table
+MIN_BUDGET = 15
+RESULT_RESERVE = 2  # seconds kept back for parsing and building the response
+STAGE_SLACK = 2  # a stage's own deadline ends this much earlier, so it can still return partial results
+BLACKLIST_REFRESH_MIN = 20  # below this allotment the on-disk blacklist is used instead of a fresh download
+MIN_PROBE_TIME = 10  # version/OS probes are skipped when less than this is left
+
+# Share of the budget each stage may use. The stages run concurrently, so the shares do not add up
+# to 1: the blacklist refresh and the capture run one after the other inside the capture stage.
+STAGE_SHARES = {
+    "network": 1.0,
+    "subnet": 1.0,
+    "blacklist": 0.25,
+    "capture": 0.75,
+}
+
+
+class ScanBudget:
+    """
+    Wall-clock budget for one scan. Every stage asks it how long its next blocking step may take,
+    and records how it ended so the response can tell complete results from partial ones.
+    Without a total every method falls back to the unbounded defaults.
+    """
+
+    def __init__(self, total: float = None):
+        self.total = total
+        self.started = time.monotonic()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        return self.total is not None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        """Seconds left before results must be assembled, or None without a budget."""
+        if not self.limited:
+            return None
+        return max(0.0, self.total - RESULT_RESERVE - self.elapsed())
+
+    def allotted(self, stage: str):
+        if not self.limited:
+            return None
+        return self.total * STAGE_SHARES.get(stage, 1.0)
+
+    def deadline(self, stage: str, default: float = None):
+        """How long a blocking step of `stage` may run: its share of the budget, capped by what is left."""
+        if not self.limited:
+            return default
+        left = min(self.allotted(stage) - self.elapsed(), self.remaining() - STAGE_SLACK)
+        if default is not None:
+            left = min(left, default)
+        return max(0.0, left)
+
+    def capture_duration(self, default: int = DEFAULT_CAPTURE_DURATION) -> int:
+        """Shrink the capture so it ends, table printed, inside the capture share of what is left."""
+        if not self.limited:
+            return default
+        fits = int(self.deadline("capture") - CAPTURE_OVERHEAD)
+        return max(MIN_CAPTURE_DURATION, min(default, fits))
+
+    def refresh_blacklist(self) -> bool:
+        return not self.limited or self.allotted("blacklist") >= BLACKLIST_REFRESH_MIN
+
+    def nmap_timing(self, stage: str, timing: str = "-T5") -> str:
+        """Timing options that keep single slow hosts from eating the whole stage."""
+        if not self.limited:
+            return timing
+        host_timeout = max(5, int(self.deadline(stage) * 0.5))
+        return f"{timing} --max-retries 1 --host-timeout {host_timeout}s"
+
+    def discovery_options(self, stage: str) -> str:
+        """Fewer ports for the discovery scan when the stage has little time."""
+        if not self.limited:
+            return ""
+        allotted = self.allotted(stage)
+        if allotted < 60:
+            return "--top-ports 100"
+        if allotted < 180:
+            return "--top-ports 500"
+        return ""
+
+    def record(self, stage: str, status: str, started: float = None):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"status": status, "allotted": self.allotted(stage)})
+            # A stage that reported partial results stays partial when it returns normally, and one
+            # that was dropped at the deadline keeps that status whatever its thread does afterwards
+            if entry["status"] == "timed_out":
+                return
+            if not (entry["status"] == "partial" and status == "completed"):
+                entry["status"] = status
+            if started is not None:
+                entry["elapsed"] = round(time.monotonic() - started, 2)
+
+    def run_stage(self, stage: str, func):
+        """Wrap a stage callable so its status and duration are recorded."""
+        def run():
+            started = time.monotonic()
+            self.record(stage, "running")
+            try:
+                result = func()
+            except Exception:
+                self.record(stage, "failed", started)
+                raise
+            self.record(stage, "completed", started)
+            return result
+        return run
+
+    def report(self):
+        if not self.limited:
+            return None
+        with self._lock:
+            stages = {name: dict(entry) for name, entry in self.stages.items()}
+        return {"total": self.total, "elapsed": round(self.elapsed(), 2), "stages": stages}
@@ -1,7 +1,21 @@
 import paramiko
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
 
+MAX_CHANNELS = 8  # stay below sshd's default MaxSessions of 10, counted across every caller of the connector
+
+
+class ChannelDeadlineExceeded(Exception):
+    """Raised when a multiplexed command outlives its deadline; carries whatever output was buffered."""
+
+    def __init__(self, command: str, deadline: float, output: str):
+        super().__init__(f"Command exceeded its {deadline}s deadline: {command}")
+        self.command = command
+        self.deadline = deadline
+        self.output = output
+
 
 class SSHConnector:
     def __init__(self, ip: str, username: str, private_key: str, sudo_password: str = None, timeout: int = 10):
@@ -13,6 +27,7 @@ class SSHConnector:
         self.client = paramiko.SSHClient()
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self.shell = None
+        self._channel_slots = threading.BoundedSemaphore(MAX_CHANNELS)
 
     def __enter__(self):
         self.connect()
@@ -135,6 +150,111 @@ class SSHConnector:
         output = stdout.read().decode()
         return output
 
+    def execute_on_channel(self, command: str, use_sudo: bool = False, deadline: float = None) -> str:
+        """
+        Run a command on its own PTY channel of the shared transport, so several can run at once.
+        Output is buffered per channel; the channel is closed if it outlives `deadline` seconds.
+        At most MAX_CHANNELS channels are open at a time; waiting for a free one counts against `deadline`.
+        """
+        if use_sudo:
+            command = f"sudo {command}"
+
+        started = time.monotonic()
+        if not self._channel_slots.acquire(timeout=deadline):
+            raise ChannelDeadlineExceeded(command, deadline, "")
+
+        chunks = []
+        try:
+            channel = self.client.get_transport().open_session()
+        except Exception:
+            self._channel_slots.release()
+            raise
+
+        try:
+            channel.get_pty()
+            channel.exec_command(command)
+
+            if use_sudo and self.sudo_password:
+                channel.sendall(f"{self.sudo_password}\n")
+
+            while True:
+                if channel.recv_ready():
+                    chunks.append(channel.recv(65536))
+                    continue
+                if channel.exit_status_ready():
+                    while channel.recv_ready():
+                        chunks.append(channel.recv(65536))
+                    break
+                if deadline is not None and time.monotonic() - started > deadline:
+                    raise ChannelDeadlineExceeded(command, deadline, self._decode(chunks))
+                time.sleep(0.05)
+        finally:
+            channel.close()
+            self._channel_slots.release()
+
+        return self._decode(chunks)
+
+    def session_endpoints(self):
+        """
+        (client_ip, client_port, server_ip, server_port) of this SSH session as the device sees it.
+        $SSH_CONNECTION is authoritative behind NAT; the socket addresses are the fallback.
+        """
+        if getattr(self, "_session_endpoints", None):
+            return self._session_endpoints
+
+        fields = self.execute_on_channel("echo $SSH_CONNECTION", deadline=self.timeout).split()
+        if len(fields) == 4 and fields[1].isdigit() and fields[3].isdigit():
+            endpoints = (fields[0], int(fields[1]), fields[2], int(fields[3]))
+        else:
+            transport = self.client.get_transport()
+            client_ip, client_port = transport.sock.getsockname()[:2]
+            server_ip, server_port = transport.getpeername()[:2]
+            endpoints = (client_ip, client_port, server_ip, server_port)
+
+        self._session_endpoints = endpoints
+        return endpoints
+
+    @staticmethod
+    def _decode(chunks) -> str:
+        return b"".join(chunks).decode(errors="replace").replace("\r\n", "\n")
+
+    def execute_multiplexed(self, commands: dict[str, str], use_sudo: bool = False,
+                            deadline: float = None) -> dict[str, str]:
+        """Run named commands concurrently, one channel each; failures are reported like run_commands does."""
+        if not commands:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(len(commands), MAX_CHANNELS)) as pool:
+            futures = {
+                name: pool.submit(self.execute_on_channel, command, use_sudo, deadline)
+                for name, command in commands.items()
+            }
+
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except ChannelDeadlineExceeded as e:
+                print(f"[!] {e}")
+                results[name] = e.output
+            except Exception as e:
+                results[name] = f"Error: {str(e)}"
+        return results
+
+    def stream_with_pty(self, command: str, use_sudo: bool = False):
+        """Run a long-lived command and yield its output line by line until the channel closes."""
+        if use_sudo:
+            command = f"sudo {command}"
+
+        stdin, stdout, stderr = self.client.exec_command(command, get_pty=True)
+
+        if use_sudo and self.sudo_password:
+            stdin.write(f"{self.sudo_password}\n")
+            stdin.flush()
+
+        for line in stdout:
+            yield line.rstrip("\r\n")
+
     def close(self):
         if self.shell and not self.shell.closed:
             self.close_sudo_session()
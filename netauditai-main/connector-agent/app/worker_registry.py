@@ -0,0 +1,62 @@
+import fcntl
+import glob
+import os
+import tempfile
+
+# uvicorn --workers and gunicorn both default their worker count to WEB_CONCURRENCY,
+# setup/gunicorn.conf.py exports the count it uses as CONNECTOR_WORKERS
+CONFIGURED_WORKERS = int(os.getenv("CONNECTOR_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1")
+
+_worker_lock = None
+
+
+def _lock_pattern(pid="*"):
+    # Workers of one server are forked by the same master, so its pid groups them
+    return os.path.join(tempfile.gettempdir(), f"netaudit-worker-{os.getppid()}-{pid}.lock")
+
+
+def register_worker():
+    """Hold a lock file for as long as this process lives, so its sibling workers can count it."""
+    global _worker_lock
+    if _worker_lock is not None:
+        return
+    lock_file = open(_lock_pattern(os.getpid()), "w")
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    _worker_lock = lock_file
+
+
+def unregister_worker():
+    global _worker_lock
+    if _worker_lock is None:
+        return
+    try:
+        os.remove(_lock_pattern(os.getpid()))
+    except OSError:
+        pass
+    _worker_lock.close()
+    _worker_lock = None
+
+
+def live_workers() -> int:
+    """Worker processes of this server that are alive now, this one included."""
+    count = 1 if _worker_lock is not None else 0
+    for path in glob.glob(_lock_pattern()):
+        if path == _lock_pattern(os.getpid()):
+            continue
+        try:
+            with open(path, "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    count += 1
+                    continue
+                # Left behind by a worker that exited (restarted by the master, or crashed)
+                os.remove(path)
+        except OSError:
+            continue
+    return count
+
+
+def worker_count() -> int:
+    """The configured worker count, or more when e.g. `uvicorn --workers N` forked N without saying so."""
+    return max(CONFIGURED_WORKERS, live_workers())
@@ -0,0 +1,87 @@
+"""
+Size and encoding time of a large /scan response in each format the connector can send:
+
+    python setup/benchmark_encoding.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from models import ScanResponse
+from response_encoding import MSGPACK_TYPES, compress_body, encode_body, msgpack, zstandard
+
+
+def _legacy_payload(results: dict) -> bytes:
+    # What /scan produced before typed models: indented JSON strings nested inside the response
+    legacy = {
+        "performance_assessment": [
+            {"interface": entry["interface"], "assessment": json.dumps(entry["assessment"], indent=4)}
+            for entry in results["performance_assessment"]
+        ],
+        "network_scan_result": results["network_scan_result"],
+        "packet_tracer_result": json.dumps(results["packet_tracer_result"], indent=4),
+    }
+    return json.dumps({"status": "OK", "results": legacy}).encode()
+
+
+def _sample_results(hosts: int = 254, conversations: int = 40):
+    results = {
+        "performance_assessment": [],
+        "network_scan_result": {"hosts": []},
+        "packet_tracer_result": {},
+    }
+    assessment = {}
+    for i in range(1, hosts + 1):
+        ip = f"192.168.1.{i}"
+        results["network_scan_result"]["hosts"].append({
+            "address": ip,
+            "ports": [
+                {"portid": "22", "state": "open", "service": "ssh", "version": "OpenSSH 8.9p1 Ubuntu"},
+                {"portid": "443", "state": "open", "service": "https", "version": "nginx 1.18.0"},
+            ],
+            "os": "Linux 5.X",
+        })
+        results["packet_tracer_result"][ip] = "[+] IP seems clean."
+        assessment[f"{ip}:22"] = {
+            "total_packets": conversations * 10,
+            "total_bytes": conversations * 15000,
+            "total_duration": conversations * 1.5,
+            "average_throughput": 80000.0,
+            "conversations": [
+                {"destination": f"10.0.0.{j}:{40000 + j}", "total_frames": 10, "total_bytes": 15000, "duration": 1.5}
+                for j in range(conversations)
+            ],
+        }
+    results["performance_assessment"].append({"interface": "eth0", "assessment": assessment})
+    return results
+
+
+def benchmark(rounds: int = 20):
+    results = _sample_results()
+    model = ScanResponse(status="OK", results=results)
+
+    def timed(encode):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            body = encode()
+        return body, (time.perf_counter() - started) / rounds * 1000
+
+    rows = [("legacy nested json", *timed(lambda: _legacy_payload(results)))]
+    body, elapsed = timed(lambda: encode_body(model))
+    rows.append(("typed json", body, elapsed))
+    rows.append(("typed json + gzip", *timed(lambda: compress_body(encode_body(model), "gzip"))))
+    if zstandard is not None:
+        rows.append(("typed json + zstd", *timed(lambda: compress_body(encode_body(model), "zstd"))))
+    if msgpack is not None:
+        rows.append(("typed msgpack", *timed(lambda: encode_body(model, MSGPACK_TYPES[0]))))
+
+    print(f"{'encoding':<20} {'bytes':>12} {'ms':>10}")
+    for name, body, elapsed in rows:
+        print(f"{name:<20} {len(body):>12} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
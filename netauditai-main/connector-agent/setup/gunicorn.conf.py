@@ -0,0 +1,31 @@
+"""
+Prefork mode for the connector-agent:
+
+    gunicorn -c setup/gunicorn.conf.py --chdir app main:app
+
+The app is imported once in the master and forked, so workers share its code pages, and the
+blocklist index is built before the fork into /dev/shm, where every worker maps the same copy.
+Monitors and schedules keep their state in process memory and are only served with WEB_CONCURRENCY=1.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Read by the app: with more than one worker, monitors and schedules (in-memory state) are refused,
+# the scheduler does not start and only one worker consumes the scan queue
+os.environ["CONNECTOR_WORKERS"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Scans hold a request open for minutes
+timeout = int(os.getenv("WORKER_TIMEOUT", "1800"))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    from IP.ip_blacklist_checker import load_blacklist
+    from IP.ip_enrichment import get_enricher
+
+    load_blacklist()
+    server.log.info("Blocklist index built before forking workers")
+    # Workers inherit the loaded enrichment tables instead of each parsing the datasets again
+    get_enricher()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app runs with app/ as its working directory and imports its packages flat
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+DEVICE = "192.168.1.10"
+REQUEST = {"method": "ssh", "ip": DEVICE, "username": "audit", "private_key": "key", "sudo_pwd": "pwd",
+           "interfaces": ["eth0"]}
+
+
+class FakeConnector:
+    opened = []
+
+    def __init__(self, ip, username, private_key, sudo_password):
+        self.ip = ip
+        self.closed = False
+        FakeConnector.opened.append(self)
+
+    def connect(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeMonitor:
+    def __init__(self, connector, interfaces, capture_filter="tcp"):
+        self.connector = connector
+        self.running = False
+        self.stopped = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        self.stopped = True
+        self.connector.close()
+
+    def stats(self, history=None):
+        return {"ip": self.connector.ip, "running": self.running}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    FakeConnector.opened = []
+    monkeypatch.setattr(main, "SSHConnector", FakeConnector)
+    monkeypatch.setattr(main, "FlowMonitor", FakeMonitor)
+    monkeypatch.setattr(main, "capture_filter_for", lambda connector, *args, **kwargs: "tcp")
+    monkeypatch.setattr(main, "monitors", {})
+    # No `with`: the startup hooks (blocklist download, scheduler) are not needed here
+    return TestClient(main.app)
+
+
+def test_running_monitor_is_reused(client):
+    assert client.post("/monitor", json=REQUEST).status_code == 200
+    assert client.post("/monitor", json=REQUEST).status_code == 200
+
+    assert len(FakeConnector.opened) == 1
+
+
+def test_dead_monitor_is_stopped_before_it_is_replaced(client):
+    client.post("/monitor", json=REQUEST)
+    dead = main.monitors[DEVICE]
+    dead.running = False  # its capture thread exited
+
+    assert client.post("/monitor", json=REQUEST).status_code == 200
+
+    assert dead.stopped and dead.connector.closed
+    assert main.monitors[DEVICE] is not dead and main.monitors[DEVICE].running
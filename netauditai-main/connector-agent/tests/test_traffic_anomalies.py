@@ -0,0 +1,54 @@
+from IP.traffic_anomalies import detect_anomalies
+from TCP.capture_filter import drop_own_scan
+
+DEVICE = "192.168.1.10"
+
+
+def nmap_probe_rows(target="192.168.1.20", ports=range(1, 1001)):
+    """conv,tcp rows as a SYN scan of `ports` from the device leaves them: one short flow per port."""
+    return [
+        {
+            "source": f"{DEVICE}:{40000 + index % 20000}",
+            "destination": f"{target}:{port}",
+            "total_frames": 2,
+            "total_bytes": 118,
+            "relative_start": index * 0.002,
+            "duration": 0.001,
+        }
+        for index, port in enumerate(ports)
+    ]
+
+
+def test_own_nmap_probes_are_not_reported_as_a_port_scan():
+    rows = nmap_probe_rows()
+    assert f"{DEVICE} port-scan" in detect_anomalies(rows)
+
+    kept = drop_own_scan(rows, {DEVICE}, ["192.168.1.0/24"])
+    assert kept == []
+    assert detect_anomalies(kept) == {}
+
+
+def test_other_traffic_of_the_device_is_kept():
+    outside = {"source": f"{DEVICE}:50000", "destination": "93.184.216.34:443", "total_frames": 40,
+               "total_bytes": 9000, "relative_start": 1.0, "duration": 2.0}
+    assert drop_own_scan(nmap_probe_rows() + [outside], {DEVICE}, ["192.168.1.0/24"]) == [outside]
+
+
+def connections(period, count, jitter=0.0, seed=1):
+    import random
+    rng = random.Random(seed)
+    start, rows = 0.0, []
+    for _ in range(count):
+        rows.append({"source": "10.0.0.5:51000", "destination": "203.0.113.9:443", "total_frames": 12,
+                     "total_bytes": 2400, "relative_start": start, "duration": 0.2})
+        start += period * (1 + rng.uniform(-jitter, jitter))
+    return rows
+
+
+def test_fast_polling_in_a_short_capture_is_not_beaconing():
+    assert detect_anomalies(connections(period=1.0, count=10)) == {}
+
+
+def test_jittered_beacon_over_a_long_window_is_reported():
+    findings = detect_anomalies(connections(period=60.0, count=20, jitter=0.3))
+    assert "10.0.0.5 -> 203.0.113.9:443 beacon" in findings
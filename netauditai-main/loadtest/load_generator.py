@@ -0,0 +1,275 @@
+"""
+Open-loop load generator for the analyzer-agent (/analyze) and the chatbot (/chat).
+
+Requests are fired on a fixed schedule at the target rate whether or not earlier ones have
+returned, so a service that serialises requests shows up as growing latency instead of a
+politely lower request rate. While a step runs, /health is probed every PROBE_INTERVAL: on
+an idle loop it answers in ~1ms, so its extra latency is the time the event loop was blocked.
+
+Example, with both services started against mock_openai.py:
+    python load_generator.py --target analyze=http://localhost:8001 --target chat=http://localhost:8002 \
+        --rps 1,5,10,25,50 --duration 30 --pid analyze=12345 --pid chat=12346
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import time
+
+import httpx
+
+PROBE_INTERVAL = 0.1
+REQUEST_TIMEOUT = 300.0
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+SERVICES = [("22", "ssh", "OpenSSH 9.6p1"), ("80", "http", "nginx 1.24.0"), ("443", "https", "nginx 1.24.0"),
+            ("445", "microsoft-ds", ""), ("3306", "mysql", "MySQL 8.0.36")]
+DEFAULT_HOSTS = 8  # the analyzer switches to map-reduce from MAP_REDUCE_MIN_HOSTS (16) hosts
+
+
+def _host_address(index):
+    return f"10.0.{index // 250}.{index % 250 + 1}"
+
+
+def analyze_payload(host_count: int = DEFAULT_HOSTS, delta: bool = False):
+    """
+    A /analyze body shaped like the connector's ScanResults, with `host_count` hosts.
+    Without `delta` no target is sent, so the analyzer neither reads nor writes a baseline.
+    """
+    addresses = [_host_address(i) for i in range(host_count)]
+
+    hosts = [
+        {
+            "address": address,
+            "ports": [
+                {"portid": port, "state": "open", "service": service, "version": version}
+                for port, service, version in random.sample(SERVICES, random.randint(1, len(SERVICES)))
+            ],
+            "os": random.choice(["Linux 5.X", "Windows 10", None]),
+        }
+        for address in addresses
+    ]
+
+    assessment = {}
+    for address in addresses:
+        conversations = [
+            {
+                "destination": f"{random.choice(addresses)}:{random.choice(SERVICES)[0]}",
+                "total_frames": random.randint(10, 5000),
+                "total_bytes": random.randint(1_000, 5_000_000),
+                "duration": round(random.uniform(0.5, 10.0), 3),
+            }
+            for _ in range(random.randint(1, 5))
+        ]
+        total_bytes = sum(conv["total_bytes"] for conv in conversations)
+        total_duration = sum(conv["duration"] for conv in conversations)
+        assessment[f"{address}:{random.randint(32768, 60999)}"] = {
+            "total_packets": sum(conv["total_frames"] for conv in conversations),
+            "total_bytes": total_bytes,
+            "total_duration": total_duration,
+            "average_throughput": total_bytes * 8 / total_duration,
+            "conversations": conversations,
+            "folded_conversations": 0,
+            "folded_sources": 0,
+        }
+
+    top = sorted(assessment.items(), key=lambda item: item[1]["total_bytes"], reverse=True)[:20]
+    heavy_hitters = {
+        "k": 20,
+        "sketch_capacity": 64,
+        "top_by_bytes": [
+            {"talker": source.rpartition(":")[0], "bytes": data["total_bytes"], "error": 0, "guaranteed": True}
+            for source, data in top
+        ],
+        "total_bytes": sum(data["total_bytes"] for data in assessment.values()),
+        "total_packets": sum(data["total_packets"] for data in assessment.values()),
+        "total_flows": sum(len(data["conversations"]) for data in assessment.values()),
+    }
+
+    tracer = {address: "[+] IP seems clean." for address in addresses}
+    tracer[random.choice(addresses)] = "[!] IP is suspicious!"
+    tracer[f"{random.choice(addresses)} port-scan"] = "[!] Possible port scan: 120 ports probed in 8.2s"
+
+    payload = {
+        "performance_assessment": [{"interface": "eth0", "assessment": assessment, "heavy_hitters": heavy_hitters}],
+        "network_scan_result": {"hosts": hosts},
+        "packet_tracer_result": tracer,
+    }
+    if delta:
+        # Every request after the first takes the delta path against this one synthetic baseline,
+        # which never collides with the baseline of a real device
+        payload["target"] = f"loadtest-{host_count}-hosts"
+    return payload
+
+
+def chat_payload():
+    return {"prompt": random.choice([
+        "What does an open SMB port mean for my network?",
+        "How do I reduce retransmissions on a congested link?",
+        "Explain why mDNS traffic was flagged as suspicious.",
+    ])}
+
+
+ENDPOINTS = {
+    "analyze": ("/analyze", analyze_payload),
+    "chat": ("/chat", chat_payload),
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def cpu_seconds(pid):
+    """utime + stime of a process from /proc/<pid>/stat (Linux only)."""
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name may contain spaces, so split after its closing parenthesis
+        fields = f.read().rpartition(")")[2].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+async def _send(client, url, payload_factory, results):
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, json=payload_factory())
+        body = response.json()
+        ok = response.status_code == 200 and "error" not in body
+    except Exception:
+        ok = False
+    results.append((time.perf_counter() - started, ok))
+
+
+async def _probe_loop(client, health_url, lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get(health_url)
+            lags.append(time.perf_counter() - started)
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), PROBE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_step(name, base_url, rps, duration, pid=None):
+    path, payload_factory = ENDPOINTS[name]
+    url = base_url.rstrip("/") + path
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    results, lags = [], []
+
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits) as client, \
+            httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as probe_client:
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_loop(probe_client, base_url.rstrip("/") + "/health", lags, stop))
+        cpu_before = cpu_seconds(pid) if pid else None
+
+        started = time.perf_counter()
+        tasks = []
+        total = int(rps * duration)
+        for i in range(total):
+            # Fixed schedule: sleep until the i-th slot instead of waiting on earlier requests
+            delay = started + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(_send(client, url, payload_factory, results)))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+        cpu_after = cpu_seconds(pid) if pid else None
+
+    latencies = [latency for latency, ok in results if ok]
+    baseline_lag = min(lags) if lags else 0.0
+    return {
+        "service": name,
+        "target_rps": rps,
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "achieved_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "loop_lag_p99": percentile([lag - baseline_lag for lag in lags], 99),
+        "loop_lag_max": max(lags) - baseline_lag if lags else None,
+        "cpu_percent": round(100 * (cpu_after - cpu_before) / elapsed, 1) if pid else None,
+    }
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value * 1000:.0f}ms" if value < 100 else f"{value:.1f}"
+    return str(value)
+
+
+def print_report(rows):
+    columns = ["service", "target_rps", "achieved_rps", "requests", "errors",
+               "p50", "p95", "p99", "loop_lag_p99", "loop_lag_max", "cpu_percent"]
+    print("  ".join(f"{column:>12}" for column in columns))
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = row[column]
+            if column in ("achieved_rps", "cpu_percent", "target_rps") and value is not None:
+                cells.append(f"{value:>12}")
+            else:
+                cells.append(f"{_fmt(value):>12}")
+        print("  ".join(cells))
+
+
+def _pairs(values):
+    pairs = {}
+    for value in values or []:
+        name, _, rest = value.partition("=")
+        if name not in ENDPOINTS or not rest:
+            raise SystemExit(f"[!] Expected {'|'.join(ENDPOINTS)}=<value>, got {value!r}")
+        pairs[name] = rest
+    return pairs
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test /analyze and /chat at fixed request rates")
+    parser.add_argument("--target", action="append", required=True,
+                        help="service=base_url, e.g. analyze=http://localhost:8001 (repeatable)")
+    parser.add_argument("--rps", default="1,5,10,25,50", help="comma separated request rates to step through")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per step")
+    parser.add_argument("--pid", action="append", help="service=pid of the uvicorn process, to report its CPU use")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--hosts", type=int, default=DEFAULT_HOSTS,
+                        help="hosts in each /analyze scan payload (from 16 hosts the analyzer uses map-reduce)")
+    parser.add_argument("--delta", action="store_true",
+                        help="send a fixed synthetic /analyze target, so requests take the incremental (baseline) path")
+    args = parser.parse_args()
+
+    ENDPOINTS["analyze"] = ("/analyze", functools.partial(analyze_payload, args.hosts, args.delta))
+
+    targets = _pairs(args.target)
+    pids = {name: int(pid) for name, pid in _pairs(args.pid).items()}
+    rates = [float(rate) for rate in args.rps.split(",")]
+
+    rows = []
+    for name, base_url in targets.items():
+        for rps in rates:
+            print(f"[+] {name}: {rps} rps for {args.duration:.0f}s")
+            rows.append(await run_step(name, base_url, rps, args.duration, pids.get(name)))
+
+    print_report(rows)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,220 @@
+"""
+Mock of the parts of the OpenAI Assistants API that the analyzer-agent and chatbot use
+(threads, messages, runs, run retrieval and run streaming), with configurable latency.
+
+Point a service at it with:
+    OPENAI_BASE_URL=http://localhost:9000/v1 OPENAI_API_KEY=mock OPENAI_ASSISTANT_ID=asst_mock
+
+Run it with:
+    python mock_openai.py --port 9000 --latency 2.0 --jitter 0.5 --tokens 400
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+config = {
+    "latency": 2.0,  # seconds a run stays in progress
+    "jitter": 0.5,  # +/- seconds added to every run
+    "tokens": 400,  # words in the generated answer
+    "stream_chunk_tokens": 8,  # words per thread.message.delta event
+    "retention": 60.0,  # seconds an idle thread and its finished runs are kept
+}
+
+threads = {}
+runs = {}
+last_used = {}  # thread id -> time.monotonic() of its last request
+
+app = FastAPI()
+
+
+def _id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def _answer():
+    words = ["Executive", "Summary", "network", "risk", "throughput", "host", "port", "finding"]
+    return "# Executive Summary\n" + " ".join(random.choice(words) for _ in range(config["tokens"]))
+
+
+def _message(thread_id, role, text, assistant_id=None, run_id=None):
+    return {
+        "id": _id("msg"),
+        "object": "thread.message",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "role": role,
+        "status": "completed",
+        "assistant_id": assistant_id,
+        "run_id": run_id,
+        "attachments": [],
+        "metadata": {},
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+    }
+
+
+def _run_object(run):
+    elapsed = time.monotonic() - run["started"]
+    status = "completed" if elapsed >= run["duration"] else ("in_progress" if elapsed > 0.05 else "queued")
+    return {
+        "id": run["id"],
+        "object": "thread.run",
+        "created_at": run["created_at"],
+        "thread_id": run["thread_id"],
+        "assistant_id": run["assistant_id"],
+        "status": status,
+        "model": "mock-model",
+        "instructions": "",
+        "tools": [],
+        "parallel_tool_calls": True,
+        "metadata": {},
+    }
+
+
+def _complete(run):
+    if not run["answered"]:
+        run["answered"] = True
+        threads[run["thread_id"]].insert(
+            0, _message(run["thread_id"], "assistant", run["answer"], run["assistant_id"], run["id"])
+        )
+
+
+def _touch(thread_id):
+    last_used[thread_id] = time.monotonic()
+
+
+def _prune():
+    # A long load test creates a thread per request, drop the ones no client will ask about again
+    cutoff = time.monotonic() - config["retention"]
+    for thread_id in [thread_id for thread_id, used in last_used.items() if used < cutoff]:
+        threads.pop(thread_id, None)
+        del last_used[thread_id]
+    for run_id in [run_id for run_id, run in runs.items() if run["thread_id"] not in threads]:
+        del runs[run_id]
+
+
+@app.post("/v1/threads")
+async def create_thread():
+    _prune()
+    thread_id = _id("thread")
+    threads[thread_id] = []
+    _touch(thread_id)
+    return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+
+@app.post("/v1/threads/{thread_id}/messages")
+async def create_message(thread_id: str, request: Request):
+    body = await request.json()
+    content = body.get("content", "")
+    message = _message(thread_id, body.get("role", "user"), content if isinstance(content, str) else json.dumps(content))
+    threads.setdefault(thread_id, []).insert(0, message)
+    _touch(thread_id)
+    return message
+
+
+@app.get("/v1/threads/{thread_id}/messages")
+async def list_messages(thread_id: str):
+    data = threads.get(thread_id, [])
+    if thread_id in threads:
+        _touch(thread_id)
+    return {
+        "object": "list",
+        "data": data,
+        "first_id": data[0]["id"] if data else None,
+        "last_id": data[-1]["id"] if data else None,
+        "has_more": False,
+    }
+
+
+@app.post("/v1/threads/{thread_id}/runs")
+async def create_run(thread_id: str, request: Request):
+    body = await request.json()
+    run = {
+        "id": _id("run"),
+        "thread_id": thread_id,
+        "assistant_id": body.get("assistant_id", "asst_mock"),
+        "created_at": int(time.time()),
+        "started": time.monotonic(),
+        "duration": max(0.0, config["latency"] + random.uniform(-config["jitter"], config["jitter"])),
+        "answer": _answer(),
+        "answered": False,
+    }
+    runs[run["id"]] = run
+    _touch(thread_id)
+
+    if body.get("stream"):
+        return StreamingResponse(_stream_run(run), media_type="text/event-stream")
+    return _run_object(run)
+
+
+@app.get("/v1/threads/{thread_id}/runs/{run_id}")
+async def retrieve_run(thread_id: str, run_id: str):
+    run = runs.get(run_id)
+    if run is None or run["thread_id"] != thread_id:
+        raise HTTPException(status_code=404, detail=f"No run found with id '{run_id}'.")
+    _touch(thread_id)
+    payload = _run_object(run)
+    if payload["status"] == "completed":
+        _complete(run)
+    return payload
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_run(run):
+    yield _event("thread.run.created", _run_object(run))
+    words = run["answer"].split(" ")
+    step = config["stream_chunk_tokens"]
+    chunks = max(1, len(words) // step)
+    delay = run["duration"] / chunks
+    message_id = _id("msg")
+    for index in range(0, len(words), step):
+        await asyncio.sleep(delay)
+        _touch(run["thread_id"])
+        yield _event("thread.message.delta", {
+            "id": message_id,
+            "object": "thread.message.delta",
+            "delta": {"content": [{"index": 0, "type": "text", "text": {"value": " ".join(words[index:index + step]) + " "}}]},
+        })
+    _complete(run)
+    run["started"] -= run["duration"]  # make sure a later retrieve reports it as completed
+    yield _event("thread.run.completed", _run_object(run))
+    yield "event: done\ndata: [DONE]\n\n"
+
+
+@app.get("/health")
+async def health():
+    return {"status": "OK", "threads": len(threads), "runs": len(runs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI Assistants API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=config["latency"])
+    parser.add_argument("--jitter", type=float, default=config["jitter"])
+    parser.add_argument("--tokens", type=int, default=config["tokens"])
+    parser.add_argument("--stream-chunk-tokens", type=int, default=config["stream_chunk_tokens"])
+    parser.add_argument("--retention", type=float, default=config["retention"])
+    args = parser.parse_args()
+
+    config.update(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens=args.tokens,
+        stream_chunk_tokens=args.stream_chunk_tokens,
+        retention=args.retention,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/health")
+async def health():
+    return {"status": "OK"}
+
 class PromptRequest(BaseModel):
     prompt: str
 